@@ -99,28 +99,34 @@ async def get_or_create_context(proxy=None):
         # WITH PROXY: Get or create shared context for this specific proxy
         proxy_key = f"{proxy['server']}"  # Unique key per proxy
         
-        async with context_pool_lock:
-            if proxy_key not in shared_contexts_with_proxy:
-                print(f"🆕 Creating shared context for proxy: {proxy_key}")
-                # SERIALIZE context creation (Camoufox issue #279)
-                async with context_creation_semaphore:
-                    shared_contexts_with_proxy[proxy_key] = await global_browser.new_context(proxy=proxy)
-                print(f"✅ Proxy context created! (Total contexts: {len(shared_contexts_with_proxy) + 1})")
-            
-            context = shared_contexts_with_proxy[proxy_key]
+        # Fast path: context already exists (no lock needed, dict reads don't yield)
+        context = shared_contexts_with_proxy.get(proxy_key)
+        if context is None:
+            async with context_pool_lock:
+                # Re-check: another task may have created it while we waited
+                context = shared_contexts_with_proxy.get(proxy_key)
+                if context is None:
+                    print(f"🆕 Creating shared context for proxy: {proxy_key}")
+                    # SERIALIZE context creation (Camoufox issue #279)
+                    async with context_creation_semaphore:
+                        context = await global_browser.new_context(proxy=proxy)
+                    shared_contexts_with_proxy[proxy_key] = context
+                    print(f"✅ Proxy context created! (Total contexts: {len(shared_contexts_with_proxy) + 1})")
         
         print(f"♻️  Reusing shared context for proxy: {proxy_key}")
     else:
         # WITHOUT PROXY: Use shared non-proxy context
-        async with context_pool_lock:
-            if shared_context_no_proxy is None:
-                print(f"🆕 Creating shared context for non-proxy requests...")
-                # SERIALIZE context creation (Camoufox issue #279)
-                async with context_creation_semaphore:
-                    shared_context_no_proxy = await global_browser.new_context()
-                print(f"✅ Non-proxy context created!")
-            
-            context = shared_context_no_proxy
+        context = shared_context_no_proxy
+        if context is None:
+            async with context_pool_lock:
+                context = shared_context_no_proxy
+                if context is None:
+                    print(f"🆕 Creating shared context for non-proxy requests...")
+                    # SERIALIZE context creation (Camoufox issue #279)
+                    async with context_creation_semaphore:
+                        context = await global_browser.new_context()
+                    shared_context_no_proxy = context
+                    print(f"✅ Non-proxy context created!")
         
         print(f"♻️  Reusing shared non-proxy context")
     
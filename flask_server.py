@@ -1,46 +1,49 @@
 #!/usr/bin/env python3
 """
 Flask Server - Queue Management Only
-Receives requests and adds them to a shared queue (Redis or file-based)
+Receives requests and adds them to a shared queue (SQLite, see queue_helper.py)
 """
 
-import json
+import orjson
 import time
 import subprocess
 import os
+import re
+import signal
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import suppress
 from datetime import datetime
-from flask import Flask, jsonify, request
+from flask import Flask, Response, request
 from pathlib import Path
 
+# Import helpers
+import queue_helper
+
 app = Flask(__name__)
 
 # Configuration
-QUEUE_DIR = "queue"
-RESULTS_DIR = "results"
 WORKER_DIR = "worker"
-QUEUE_FILE = f"{QUEUE_DIR}/task_queue.json"
-RESULTS_FILE = f"{RESULTS_DIR}/results.json"
 HEARTBEAT_TIMEOUT = 30  # seconds (consider worker dead if heartbeat older than this)
 
+# Worker launch paths (fixed for the life of the process)
+PROJECT_DIR = os.path.dirname(os.path.abspath(__file__))
+VENV_PYTHON = os.path.join(PROJECT_DIR, '.venv', 'bin', 'python3')
+WORKER_SCRIPT = os.path.join(PROJECT_DIR, 'worker.py')
+
 # Create directories if they don't exist
-Path(QUEUE_DIR).mkdir(exist_ok=True)
-Path(RESULTS_DIR).mkdir(exist_ok=True)
 Path(WORKER_DIR).mkdir(exist_ok=True)
 
 def load_json_file(filename, default=None):
     """Load JSON file safely"""
     try:
-        if Path(filename).exists():
-            with open(filename, 'r') as f:
-                return json.load(f)
+        return orjson.loads(Path(filename).read_bytes())
     except:
-        pass
-    return default if default is not None else []
+        return default if default is not None else []
 
-def save_json_file(filename, data):
-    """Save JSON file safely"""
-    with open(filename, 'w') as f:
-        json.dump(data, f, indent=2)
+def json_response(data, status=200):
+    """JSON response serialized with orjson (replaces flask.jsonify)"""
+    return Response(orjson.dumps(data), status=status, mimetype='application/json')
 
 def parse_proxy(proxy_string):
     """Parse proxy string in format: ip:port:user:pass"""
@@ -56,34 +59,170 @@ def parse_proxy(proxy_string):
         }
     return None
 
-def count_active_workers():
-    """Count active workers based on heartbeat files"""
-    active_count = 0
-    current_time = time.time()
+# ============================================================================
+# Worker Heartbeat Index
+# ============================================================================
+# A background thread re-reads worker/ every HEARTBEAT_POLL_INTERVAL seconds,
+# so requests read worker state from memory instead of globbing the directory.
+
+HEARTBEAT_POLL_INTERVAL = 1.0  # seconds
+HEARTBEAT_FILE_RE = re.compile(r'^worker_(\d+)_heartbeat\.json$')  # worker_<pid>_heartbeat.json
+
+_heartbeats = {}  # heartbeat file path -> heartbeat data (replaced wholesale, never mutated)
+_heartbeat_file_cache = {}  # heartbeat file path -> (st_mtime_ns, heartbeat data)
+_heartbeat_dir_mtime_ns = None  # worker/ mtime at the last scan
+_heartbeat_poller = None
+_heartbeat_poller_lock = threading.Lock()
+
+def scan_heartbeats(force=False):
+    """Reload every worker heartbeat file into the in-memory index
     
-    # Find all worker heartbeat files in worker directory
-    for heartbeat_file in Path(WORKER_DIR).glob('worker_*_heartbeat.json'):
+    Workers write heartbeats via temp file + rename, which bumps worker/'s mtime,
+    so an unchanged directory mtime means nothing changed (unless force=True).
+    """
+    global _heartbeats, _heartbeat_file_cache, _heartbeat_dir_mtime_ns
+    
+    try:
+        dir_mtime_ns = os.stat(WORKER_DIR).st_mtime_ns
+    except OSError:
+        dir_mtime_ns = None
+    if not force and dir_mtime_ns is not None and dir_mtime_ns == _heartbeat_dir_mtime_ns:
+        return
+    
+    heartbeats = {}
+    file_cache = {}
+    stale_before_ns = time.time_ns() - HEARTBEAT_TIMEOUT * 1_000_000_000
+    
+    with os.scandir(WORKER_DIR) as entries:
+        heartbeat_entries = [entry for entry in entries if HEARTBEAT_FILE_RE.match(entry.name)]
+    
+    for entry in heartbeat_entries:
+        path = entry.path
         try:
-            heartbeat_data = load_json_file(str(heartbeat_file), {})
-            timestamp = heartbeat_data.get('timestamp', 0)
-            pid = heartbeat_data.get('pid')
-            
-            # Check if heartbeat is recent
-            if current_time - timestamp < HEARTBEAT_TIMEOUT and pid:
-                # Verify the process actually exists
+            mtime_ns = entry.stat().st_mtime_ns
+        except OSError:
+            continue  # removed since the listing
+        
+        # Not written for HEARTBEAT_TIMEOUT - can't hold a fresh timestamp, don't parse it
+        if mtime_ns < stale_before_ns:
+            continue
+        
+        # Only re-parse files that changed since the last scan
+        cached = _heartbeat_file_cache.get(path)
+        if cached is not None and cached[0] == mtime_ns:
+            heartbeat_data = cached[1]
+        else:
+            heartbeat_data = load_json_file(path, {})
+        
+        if heartbeat_data:
+            heartbeats[path] = heartbeat_data
+            file_cache[path] = (mtime_ns, heartbeat_data)
+    
+    # Rebuilt every scan, so entries for deleted files drop out on their own
+    _heartbeat_file_cache = file_cache
+    _heartbeats = heartbeats
+    _heartbeat_dir_mtime_ns = dir_mtime_ns
+
+def poll_heartbeats():
+    """Background loop keeping the heartbeat index current"""
+    while True:
+        time.sleep(HEARTBEAT_POLL_INTERVAL)
+        try:
+            scan_heartbeats()
+        except Exception as e:
+            print(f"⚠️  Heartbeat scan failed: {e}")
+
+def get_heartbeats():
+    """Current heartbeat index (first call in this process scans and starts the poller)"""
+    global _heartbeat_poller
+    
+    if _heartbeat_poller is None:
+        with _heartbeat_poller_lock:
+            if _heartbeat_poller is None:
+                scan_heartbeats()
+                _heartbeat_poller = threading.Thread(target=poll_heartbeats, daemon=True)
+                _heartbeat_poller.start()
+    
+    return _heartbeats
+
+def get_live_heartbeats(refresh=False):
+    """Heartbeats that are recent and belong to a running process
+    
+    Args:
+        refresh: Re-scan worker/ now instead of using the last poll
+    
+    Returns:
+        list: heartbeat data dicts
+    """
+    if refresh:
+        scan_heartbeats(force=True)
+    
+    live = []
+    current_time = time.time()
+    
+    for heartbeat_file, heartbeat_data in get_heartbeats().items():
+        timestamp = heartbeat_data.get('timestamp', 0)
+        pid = heartbeat_data.get('pid')
+        
+        # Check if heartbeat is recent
+        if current_time - timestamp < HEARTBEAT_TIMEOUT and pid:
+            # Verify the process actually exists
+            try:
+                os.kill(pid, 0)  # Signal 0 doesn't kill, just checks if process exists
+                live.append(heartbeat_data)
+            except (ProcessLookupError, PermissionError):
+                # Process doesn't exist, remove stale heartbeat file
                 try:
-                    os.kill(pid, 0)  # Signal 0 doesn't kill, just checks if process exists
-                    active_count += 1
-                except (ProcessLookupError, PermissionError):
-                    # Process doesn't exist, remove stale heartbeat file
-                    try:
-                        Path(heartbeat_file).unlink()
-                    except:
-                        pass
-        except:
-            pass
-    
-    return active_count
+                    Path(heartbeat_file).unlink()
+                except:
+                    pass
+    
+    return live
+
+def count_active_workers(refresh=False):
+    """Count active workers based on heartbeat files"""
+    return len(get_live_heartbeats(refresh))
+
+def get_live_worker_pids():
+    """PIDs of running workers, from heartbeat file names + mtimes (no JSON parsing)
+    
+    Always a fresh directory listing - used by /scale, which acts on the result.
+    """
+    pids = []
+    stale_before_ns = time.time_ns() - HEARTBEAT_TIMEOUT * 1_000_000_000
+    
+    with os.scandir(WORKER_DIR) as entries:
+        for entry in entries:
+            match = HEARTBEAT_FILE_RE.match(entry.name)
+            if not match:
+                continue
+            try:
+                if entry.stat().st_mtime_ns < stale_before_ns:
+                    continue
+            except OSError:
+                continue  # removed since the listing
+            
+            pid = int(match.group(1))
+            try:
+                os.kill(pid, 0)  # Signal 0 doesn't kill, just checks if process exists
+                pids.append(pid)
+            except (ProcessLookupError, PermissionError):
+                with suppress(OSError):
+                    os.unlink(entry.path)
+    
+    return pids
+
+SCALE_SETTLE_TIMEOUT = 2.0  # seconds to wait for workers to show up / go away after /scale
+SCALE_POLL_INTERVAL = 0.05  # seconds
+
+def wait_for_worker_count(target, timeout=SCALE_SETTLE_TIMEOUT):
+    """Poll heartbeats until target workers are active (or timeout), returns the final count"""
+    deadline = time.time() + timeout
+    while True:
+        active_count = len(get_live_worker_pids())
+        if active_count == target or time.time() >= deadline:
+            return active_count
+        time.sleep(SCALE_POLL_INTERVAL)
 
 # ============================================================================
 # Flask Routes
@@ -96,26 +235,15 @@ def load_domain():
     domain = data.get('domain')
     
     if not domain:
-        return jsonify({'error': 'domain is required'}), 400
-    
-    # Load current queue
-    queue = load_json_file(QUEUE_FILE, [])
+        return json_response({'error': 'domain is required'}, 400)
     
     # Add task (no proxy - workers have their own proxies)
-    task = {
-        'domain': domain,
-        'added_at': datetime.now().isoformat(),
-        'status': 'queued'
-    }
-    queue.append(task)
+    queue_position = queue_helper.add_task(domain, datetime.now().isoformat())
     
-    # Save queue
-    save_json_file(QUEUE_FILE, queue)
-    
-    return jsonify({
+    return json_response({
         'message': 'Task added to queue',
         'domain': domain,
-        'queue_position': len(queue)
+        'queue_position': queue_position
     })
 
 
@@ -126,57 +254,45 @@ def batch_load():
     domains = data.get('domains', [])
     
     if not domains:
-        return jsonify({'error': 'domains array is required'}), 400
-    
-    # Load current queue
-    queue = load_json_file(QUEUE_FILE, [])
-    
-    # Add all domains (no proxy - workers have their own proxies)
-    added = []
-    for domain in domains:
-        task = {
-            'domain': domain,
-            'added_at': datetime.now().isoformat(),
-            'status': 'queued'
-        }
-        queue.append(task)
-        added.append({'domain': domain, 'queue_position': len(queue)})
+        return json_response({'error': 'domains array is required'}, 400)
     
-    # Save queue
-    save_json_file(QUEUE_FILE, queue)
+    # Add all domains in one transaction (no proxy - workers have their own proxies)
+    queue_length = queue_helper.add_tasks(domains, datetime.now().isoformat())
+    first_position = queue_length - len(domains) + 1
+    added = [
+        {'domain': domain, 'queue_position': first_position + i}
+        for i, domain in enumerate(domains)
+    ]
     
-    return jsonify({
+    return json_response({
         'message': f'Added {len(domains)} domains to queue',
         'domains': added,
-        'queue_length': len(queue)
+        'queue_length': queue_length
     })
 
 
 @app.route('/queue', methods=['GET'])
 def get_queue_status():
     """Get current queue status"""
-    queue = load_json_file(QUEUE_FILE, [])
-    results = load_json_file(RESULTS_FILE, {'completed': [], 'failed': []})
-    
-    queued_domains = [task['domain'] for task in queue if task.get('status') == 'queued']
-    processing_domains = [task['domain'] for task in queue if task.get('status') == 'processing']
-    
-    return jsonify({
-        'queue_length': len([t for t in queue if t.get('status') == 'queued']),
-        'processing_count': len([t for t in queue if t.get('status') == 'processing']),
-        'queued_domains': queued_domains,
-        'processing_domains': processing_domains,
-        'completed_count': len(results.get('completed', [])),
-        'failed_count': len(results.get('failed', []))
+    # Cached view, re-queried only when the database has changed since the last call
+    view = queue_helper.get_queue_view()
+    
+    return json_response({
+        'queue_length': len(view['queued_domains']),
+        'processing_count': len(view['processing_domains']),
+        'queued_domains': view['queued_domains'],
+        'processing_domains': view['processing_domains'],
+        'completed_count': view['completed'],
+        'failed_count': view['failed']
     })
 
 
 @app.route('/queue/details', methods=['GET'])
 def get_queue_details():
     """Get detailed queue information"""
-    queue = load_json_file(QUEUE_FILE, [])
+    queue = queue_helper.get_tasks()
     
-    return jsonify({
+    return json_response({
         'queue': queue,
         'queue_length': len(queue)
     })
@@ -185,33 +301,33 @@ def get_queue_details():
 @app.route('/results', methods=['GET'])
 def get_results():
     """Get all results"""
-    results = load_json_file(RESULTS_FILE, {'completed': [], 'failed': []})
+    results = queue_helper.get_results()
     
-    return jsonify({
-        'completed': results.get('completed', []),
-        'failed': results.get('failed', []),
-        'total': len(results.get('completed', [])) + len(results.get('failed', []))
+    return json_response({
+        'completed': results['completed'],
+        'failed': results['failed'],
+        'total': len(results['completed']) + len(results['failed'])
     })
 
 
 @app.route('/results/clear', methods=['POST'])
 def clear_results():
     """Clear all results"""
-    save_json_file(RESULTS_FILE, {'completed': [], 'failed': []})
-    return jsonify({'message': 'Results cleared'})
+    queue_helper.clear_results()
+    return json_response({'message': 'Results cleared'})
 
 
 @app.route('/queue/clear', methods=['POST'])
 def clear_queue():
     """Clear the queue"""
-    save_json_file(QUEUE_FILE, [])
-    return jsonify({'message': 'Queue cleared'})
+    queue_helper.clear_tasks()
+    return json_response({'message': 'Queue cleared'})
 
 
 @app.route('/health', methods=['GET'])
 def health():
     """Health check"""
-    return jsonify({
+    return json_response({
         'status': 'healthy',
         'server': 'running'
     })
@@ -222,7 +338,7 @@ def get_workers():
     """Get active worker count"""
     active_workers = count_active_workers()
     
-    return jsonify({
+    return json_response({
         'active_workers': active_workers
     })
 
@@ -233,29 +349,16 @@ def get_workers_details():
     workers = []
     current_time = time.time()
     
-    for heartbeat_file in Path(WORKER_DIR).glob('worker_*_heartbeat.json'):
-        try:
-            heartbeat_data = load_json_file(str(heartbeat_file), {})
-            timestamp = heartbeat_data.get('timestamp', 0)
-            pid = heartbeat_data.get('pid')
-            proxy = heartbeat_data.get('proxy')
-            
-            # Check if heartbeat is recent and process exists
-            if current_time - timestamp < HEARTBEAT_TIMEOUT and pid:
-                try:
-                    os.kill(pid, 0)  # Check if process exists
-                    workers.append({
-                        'pid': pid,
-                        'proxy': proxy if proxy else 'no proxy',
-                        'last_heartbeat': heartbeat_data.get('last_updated'),
-                        'age_seconds': int(current_time - timestamp)
-                    })
-                except (ProcessLookupError, PermissionError):
-                    pass
-        except:
-            pass
+    for heartbeat_data in get_live_heartbeats():
+        proxy = heartbeat_data.get('proxy')
+        workers.append({
+            'pid': heartbeat_data.get('pid'),
+            'proxy': proxy if proxy else 'no proxy',
+            'last_heartbeat': heartbeat_data.get('last_updated'),
+            'age_seconds': int(current_time - heartbeat_data.get('timestamp', 0))
+        })
     
-    return jsonify({
+    return json_response({
         'active_workers': len(workers),
         'workers': workers
     })
@@ -283,60 +386,46 @@ def scale_workers():
             proxies = []
         
         if scale < 0:
-            return jsonify({'error': 'scale must be >= 0'}), 400
+            return json_response({'error': 'scale must be >= 0'}, 400)
         
-        # Get current active workers
-        current_workers = count_active_workers()
-        
-        # Get worker PIDs from heartbeat files
-        worker_pids = []
-        current_time = time.time()
-        for heartbeat_file in Path(WORKER_DIR).glob('worker_*_heartbeat.json'):
-            try:
-                heartbeat_data = load_json_file(str(heartbeat_file), {})
-                timestamp = heartbeat_data.get('timestamp', 0)
-                pid = heartbeat_data.get('pid')
-                
-                if current_time - timestamp < HEARTBEAT_TIMEOUT and pid:
-                    worker_pids.append(pid)
-            except:
-                pass
+        # Get current worker PIDs (fresh listing - we're about to act on it)
+        worker_pids = get_live_worker_pids()
+        current_workers = len(worker_pids)
         
         # Calculate difference
         diff = scale - current_workers
         
         # SCALE UP - Start more workers
         if diff > 0:
-            project_dir = os.path.dirname(os.path.abspath(__file__))
-            venv_python = os.path.join(project_dir, '.venv', 'bin', 'python3')
-            worker_script = os.path.join(project_dir, 'worker.py')
-            
-            started_pids = []
-            started_proxies = []
-            
-            for i in range(diff):
+            def start_worker(i):
+                """Spawn one worker process, returns (pid, proxy label)"""
                 # Get proxy for this worker (if available)
                 proxy = proxies[i] if i < len(proxies) else None
                 
                 # Build command
-                cmd = [venv_python, worker_script]
+                cmd = [VENV_PYTHON, WORKER_SCRIPT]
                 if proxy:
                     cmd.extend(['--proxy', proxy])
                 
+                # Output to /dev/null: nobody reads it, and a full unread PIPE blocks the worker
                 process = subprocess.Popen(
                     cmd,
-                    stdout=subprocess.PIPE,
-                    stderr=subprocess.PIPE,
+                    stdout=subprocess.DEVNULL,
+                    stderr=subprocess.DEVNULL,
                     start_new_session=True,
-                    cwd=project_dir
+                    cwd=PROJECT_DIR
                 )
-                started_pids.append(process.pid)
-                started_proxies.append(proxy if proxy else "no proxy")
+                return process.pid, proxy if proxy else "no proxy"
             
-            time.sleep(2)
-            new_worker_count = count_active_workers()
+            # Spawn in parallel (fork/exec latency overlaps instead of adding up)
+            with ThreadPoolExecutor(max_workers=min(diff, 16)) as executor:
+                started = list(executor.map(start_worker, range(diff)))
+            started_pids = [pid for pid, _ in started]
+            started_proxies = [proxy for _, proxy in started]
             
-            return jsonify({
+            new_worker_count = wait_for_worker_count(scale)
+            
+            return json_response({
                 'message': f'Started {diff} workers',
                 'requested_scale': scale,
                 'previous_workers': current_workers,
@@ -351,18 +440,14 @@ def scale_workers():
             workers_to_kill = abs(diff)
             killed_pids = []
             
-            for i in range(min(workers_to_kill, len(worker_pids))):
-                pid = worker_pids[i]
-                try:
-                    os.kill(pid, 15)  # SIGTERM for graceful shutdown
+            for pid in worker_pids[:workers_to_kill]:
+                with suppress(ProcessLookupError, PermissionError):
+                    os.kill(pid, signal.SIGTERM)  # SIGTERM for graceful shutdown
                     killed_pids.append(pid)
-                except:
-                    pass
             
-            time.sleep(2)
-            new_worker_count = count_active_workers()
+            new_worker_count = wait_for_worker_count(current_workers - len(killed_pids))
             
-            return jsonify({
+            return json_response({
                 'message': f'Killed {len(killed_pids)} workers',
                 'requested_scale': scale,
                 'previous_workers': current_workers,
@@ -373,7 +458,7 @@ def scale_workers():
         
         # NO CHANGE
         else:
-            return jsonify({
+            return json_response({
                 'message': f'Already at scale {scale}',
                 'requested_scale': scale,
                 'active_workers': current_workers,
@@ -381,9 +466,9 @@ def scale_workers():
             })
         
     except ValueError:
-        return jsonify({'error': 'scale must be a valid integer'}), 400
+        return json_response({'error': 'scale must be a valid integer'}, 400)
     except Exception as e:
-        return jsonify({'error': str(e)}), 500
+        return json_response({'error': str(e)}, 500)
 
 
 # ============================================================================
@@ -395,18 +480,15 @@ if __name__ == '__main__':
     print("🚀 Starting Flask Server (Queue Manager)")
     print("=" * 80)
     print("Server: Receives HTTP requests")
-    print("Queue: Stored in task_queue.json")
-    print("Results: Stored in results.json")
+    print(f"Queue & results: Stored in {queue_helper.QUEUE_DB}")
     print("Worker: Run worker.py separately")
     print("=" * 80)
     
-    # Initialize files if they don't exist
-    if not Path(QUEUE_FILE).exists():
-        save_json_file(QUEUE_FILE, [])
-    if not Path(RESULTS_FILE).exists():
-        save_json_file(RESULTS_FILE, {'completed': [], 'failed': []})
+    # Initialize database if it doesn't exist
+    queue_helper.init_db()
     
     print("✅ Server ready!")
+    print("Development server - for production run: gunicorn -c gunicorn.conf.py")
     print("=" * 80)
     
     app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
@@ -0,0 +1,19 @@
+"""
+Gunicorn configuration for flask_server.py
+
+Run with:
+    gunicorn -c gunicorn.conf.py
+
+Queue and results live in SQLite (WAL mode), so any number of worker
+processes can share them without extra file locking.
+"""
+
+import multiprocessing
+
+wsgi_app = "wsgi:app"
+bind = "0.0.0.0:5001"
+
+# One process per core, a few threads each to overlap SQLite/disk waits
+workers = multiprocessing.cpu_count()
+worker_class = "gthread"
+threads = 4
@@ -12,8 +12,53 @@ import asyncio
 import base64
 import cv2
 import numpy as np
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 from camoufox_helper import get_or_create_context, create_page_in_context
 
+# Ahrefs website authority checker URL (decoded once)
+_AHREFS_URL_BASE = base64.b64decode('aHR0cHM6Ly9haHJlZnMuY29tL3dlYnNpdGUtYXV0aG9yaXR5LWNoZWNrZXI/aW5wdXQ9').decode('utf-8')
+
+# CAPTCHA search regions (x, y, width, height) - DIFFERENT for each captcha type
+CAPTCHA_REGIONS = {
+    'full_page': (150, 200, 250, 200),  # LEFT side of screen
+    'main_page': (500, 300, 400, 250),  # RIGHT-CENTER area
+}
+
+# Page readiness: either a CAPTCHA iframe or the metrics block is on screen
+CAPTCHA_SELECTOR = 'iframe[src*="recaptcha"]'
+METRICS_SELECTOR = ':text-is("Domain Rating")'  # Exact label text - :text() is a case-insensitive substring match
+READY_SELECTOR = f'{CAPTCHA_SELECTOR}, {METRICS_SELECTOR}'
+
+# White/light checkbox fill (BGR): every channel >= 200 and low chroma (max - min channel <= WHITE_MAX_CHROMA),
+# so light tints like (200, 255, 255) don't pass
+LOWER_WHITE_BGR = np.array([200, 200, 200], dtype=np.uint8)
+UPPER_WHITE_BGR = np.array([255, 255, 255], dtype=np.uint8)
+WHITE_MAX_CHROMA = 30
+
+# CV detection runs off the event loop (cv2 releases the GIL).
+# Single-threaded OpenCV so the pool threads don't oversubscribe the cores.
+cv2.setNumThreads(1)
+CV_POOL = ThreadPoolExecutor(max_workers=2)
+
+# Per-thread scratch masks for the CV pool, one per (name, region shape)
+_scratch = threading.local()
+
+
+def _scratch_buffer(name, shape):
+    """Reusable uint8 buffer owned by the calling thread"""
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    
+    key = (name, shape)
+    buf = buffers.get(key)
+    if buf is None:
+        buf = buffers[key] = np.empty(shape, np.uint8)
+    return buf
+
+
 async def extract_metrics(page):
     """Extract DR, backlinks, and linking websites from Ahrefs page"""
     metrics = await page.evaluate("""
@@ -22,12 +67,37 @@ async def extract_metrics(page):
             let backlinks = null;
             let linkingWebsites = null;
             
-            const allElements = Array.from(document.querySelectorAll('*'));
+            // One pass over text nodes to find all three labels (outermost element whose
+            // whole text is the label - same element a document-order scan of '*' finds)
+            const labels = new Map([['Domain Rating', null], ['Backlinks', null], ['Linking websites', null]]);
+            let remaining = labels.size;
+            const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+            
+            while (remaining > 0 && walker.nextNode()) {
+                const text = walker.currentNode.data.trim();
+                if (!labels.has(text) || labels.get(text)) continue;
+                
+                let el = walker.currentNode.parentElement;
+                if (!el || el.textContent.trim() !== text) continue;
+                while (el.parentElement && el.parentElement.textContent.trim() === text) {
+                    el = el.parentElement;
+                }
+                
+                labels.set(text, el);
+                remaining--;
+            }
             
-            const drLabel = allElements.find(el => el.textContent.trim() === 'Domain Rating');
-            const backlinksLabel = allElements.find(el => el.textContent.trim() === 'Backlinks');
-            const linkingLabel = allElements.find(el => el.textContent.trim() === 'Linking websites');
+            // Big numeric spans, collected once in document order
+            const NUM_RE = /^[0-9.,KM]+$/;
+            const bigNumbers = [];
+            for (const span of document.querySelectorAll('span')) {
+                const text = span.textContent.trim();
+                if (text && NUM_RE.test(text) && parseFloat(window.getComputedStyle(span).fontSize) > 25) {
+                    bigNumbers.push([span, text]);
+                }
+            }
             
+            // Closest ancestor (up to 8 levels) containing a big number wins
             const findNumber = (label) => {
                 if (!label) return null;
                 
@@ -36,12 +106,8 @@ async def extract_metrics(page):
                     parent = parent.parentElement;
                     if (!parent) break;
                     
-                    const spans = parent.querySelectorAll('span');
-                    for (const span of spans) {
-                        const text = span.textContent.trim();
-                        const fontSize = window.getComputedStyle(span).fontSize;
-                        
-                        if (text && /^[0-9.,KM]+$/.test(text) && parseFloat(fontSize) > 25) {
+                    for (const [span, text] of bigNumbers) {
+                        if (parent.contains(span)) {
                             return text;
                         }
                     }
@@ -49,9 +115,9 @@ async def extract_metrics(page):
                 return null;
             };
             
-            dr = findNumber(drLabel);
-            backlinks = findNumber(backlinksLabel);
-            linkingWebsites = findNumber(linkingLabel);
+            dr = findNumber(labels.get('Domain Rating'));
+            backlinks = findNumber(labels.get('Backlinks'));
+            linkingWebsites = findNumber(labels.get('Linking websites'));
             
             return {
                 _dr: dr,
@@ -65,12 +131,17 @@ async def extract_metrics(page):
         if not value:
             return None
         
-        value = str(value).replace(',', '')
+        value = value.replace(',', '')
         
-        if 'K' in value:
-            return int(float(value.replace('K', '')) * 1000)
-        elif 'M' in value:
-            return int(float(value.replace('M', '')) * 1000000)
+        # Plain integers (the common case) skip float parsing entirely
+        if value.isdigit():
+            return int(value)
+        
+        suffix = value[-1]
+        if suffix == 'K':
+            return int(float(value[:-1]) * 1000)
+        elif suffix == 'M':
+            return int(float(value[:-1]) * 1000000)
         else:
             return int(float(value))
     
@@ -81,39 +152,11 @@ async def extract_metrics(page):
     }
 
 
-async def find_and_click_captcha(page, captcha_type):
-    """
-    Find and click CAPTCHA checkbox using computer vision
-    
-    Args:
-        page: Playwright page object
-        captcha_type: 'full_page' or 'main_page'
-    
-    Returns:
-        bool: True if checkbox found and clicked, False otherwise
-    """
-    # Take screenshot with animations disabled (skip font waiting)
-    screenshot_bytes = await page.screenshot(
-        type='jpeg', 
-        quality=85, 
-        animations='disabled',
-        timeout=30000
-    )
-    img_array = np.frombuffer(screenshot_bytes, np.uint8)
-    img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-    
-    checkbox_candidates = []
-    
-    # METHOD 1: Color-based detection (look for white/light squares)
-    hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-    lower_white = np.array([0, 0, 200])
-    upper_white = np.array([180, 30, 255])
-    white_mask = cv2.inRange(hsv, lower_white, upper_white)
-    
-    contours_white, _ = cv2.findContours(white_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+def _checkbox_centers(contours):
+    """Centers of the contours that look like a checkbox (region coordinates)"""
+    centers = []
     
-    for contour in contours_white:
+    for contour in contours:
         x, y, w, h = cv2.boundingRect(contour)
         
         if not (18 <= w <= 32 and 18 <= h <= 32):
@@ -127,95 +170,111 @@ async def find_and_click_captcha(page, captcha_type):
         if area < 300:
             continue
         
-        center_x = x + w // 2
-        center_y = y + h // 2
-        
-        # Position filter - DIFFERENT for each captcha type
-        if captcha_type == 'full_page':
-            if not (150 < center_x < 400 and 200 < center_y < 400):
-                continue
-        else:  # main_page
-            if not (500 < center_x < 900 and 300 < center_y < 550):
-                continue
-        
-        checkbox_candidates.append({
-            'method': 'color',
-            'x': x, 'y': y, 'w': w, 'h': h,
-            'center_x': center_x,
-            'center_y': center_y,
-            'aspect_ratio': aspect_ratio,
-            'score': 10
-        })
+        centers.append((x + w // 2, y + h // 2))
+    
+    return centers
+
+
+def _white_mask(img):
+    """Mask of near-white pixels: every BGR channel >= 200 and max - min channel <= WHITE_MAX_CHROMA"""
+    shape = img.shape[:2]
+    white_mask = cv2.inRange(img, LOWER_WHITE_BGR, UPPER_WHITE_BGR, dst=_scratch_buffer('white_mask', shape))
     
-    # METHOD 2: Adaptive threshold edge detection
+    # max - min channel = the largest absolute difference between two channels
+    b = cv2.extractChannel(img, 0, dst=_scratch_buffer('channel_b', shape))
+    g = cv2.extractChannel(img, 1, dst=_scratch_buffer('channel_g', shape))
+    r = cv2.extractChannel(img, 2, dst=_scratch_buffer('channel_r', shape))
+    chroma = cv2.absdiff(b, g, dst=_scratch_buffer('chroma', shape))
+    pair_diff = _scratch_buffer('chroma_pair', shape)
+    cv2.max(chroma, cv2.absdiff(g, r, dst=pair_diff), dst=chroma)
+    cv2.max(chroma, cv2.absdiff(b, r, dst=pair_diff), dst=chroma)
+    
+    neutral_mask = cv2.inRange(chroma, 0, WHITE_MAX_CHROMA, dst=_scratch_buffer('neutral_mask', shape))
+    return cv2.bitwise_and(white_mask, neutral_mask, dst=white_mask)
+
+
+def _detect_color(img):
+    """METHOD 1: Color-based detection (look for white/light squares)"""
+    # Bright, nearly colorless pixels straight from BGR - no HSV conversion
+    white_mask = _white_mask(img)
+    
+    contours_white, _ = cv2.findContours(white_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return _checkbox_centers(contours_white)
+
+
+def _detect_adaptive(img):
+    """METHOD 2: Adaptive threshold edge detection"""
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=_scratch_buffer('gray', img.shape[:2]))
+    
+    # BINARY_INV: threshold and invert in the same pass (no separate bitwise_not)
     adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                             cv2.THRESH_BINARY, 11, 2)
-    adaptive_thresh = cv2.bitwise_not(adaptive_thresh)
+                                             cv2.THRESH_BINARY_INV, 11, 2,
+                                             dst=_scratch_buffer('adaptive_thresh', gray.shape))
     
-    contours_adaptive, _ = cv2.findContours(adaptive_thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    # Hierarchy is never used - LIST (not EXTERNAL) so a box nested in the widget frame still counts
+    contours_adaptive, _ = cv2.findContours(adaptive_thresh, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+    return _checkbox_centers(contours_adaptive)
+
+
+async def find_and_click_captcha(page, captcha_type):
+    """
+    Find and click CAPTCHA checkbox using computer vision
     
-    for contour in contours_adaptive:
-        x, y, w, h = cv2.boundingRect(contour)
-        
-        if not (18 <= w <= 32 and 18 <= h <= 32):
-            continue
-        
-        aspect_ratio = w / h if h > 0 else 0
-        if not (0.85 < aspect_ratio < 1.15):
-            continue
-        
-        area = cv2.contourArea(contour)
-        if area < 300:
-            continue
-        
-        center_x = x + w // 2
-        center_y = y + h // 2
-        
-        # Position filter
-        if captcha_type == 'full_page':
-            if not (150 < center_x < 400 and 200 < center_y < 400):
-                continue
-        else:  # main_page
-            if not (500 < center_x < 900 and 300 < center_y < 550):
-                continue
-        
-        checkbox_candidates.append({
-            'method': 'adaptive',
-            'x': x, 'y': y, 'w': w, 'h': h,
-            'center_x': center_x,
-            'center_y': center_y,
-            'aspect_ratio': aspect_ratio,
-            'score': 5
-        })
+    Args:
+        page: Playwright page object
+        captcha_type: 'full_page' or 'main_page'
     
-    # Deduplicate and find best candidate
-    unique_candidates = []
-    for candidate in checkbox_candidates:
-        is_duplicate = False
-        for unique in unique_candidates:
-            if abs(candidate['center_x'] - unique['center_x']) < 5 and \
-               abs(candidate['center_y'] - unique['center_y']) < 5:
-                if candidate['score'] > unique['score']:
-                    unique_candidates.remove(unique)
-                    unique_candidates.append(candidate)
-                is_duplicate = True
-                break
-        
-        if not is_duplicate:
-            unique_candidates.append(candidate)
+    Returns:
+        bool: True if checkbox found and clicked, False otherwise
+    """
+    # Screenshot only the region where this CAPTCHA's checkbox can appear
+    # (PNG: no JPEG encode in the browser, one lossless decode here;
+    # scale='css': one image pixel per CSS pixel, never a HiDPI-sized capture)
+    region_x, region_y, region_w, region_h = CAPTCHA_REGIONS[captcha_type]
+    screenshot_bytes = await page.screenshot(
+        type='png',
+        clip={'x': region_x, 'y': region_y, 'width': region_w, 'height': region_h},
+        scale='css',
+        animations='disabled',
+        timeout=30000
+    )
+    # Decode in color: the white mask checks every channel; the adaptive pass
+    # converts to grayscale itself (on the pool, and only if it runs)
+    img_array = np.frombuffer(screenshot_bytes, np.uint8)
+    img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
     
-    # Click the best candidate
-    if unique_candidates:
-        best = max(unique_candidates, key=lambda c: c['score'])
-        click_x = best['center_x']
-        click_y = best['center_y']
-        
-        await page.mouse.click(click_x, click_y)
+    # Detection runs on the CV pool. Color hits (score 10) always outrank adaptive
+    # hits (score 5), so the adaptive pass only runs when color finds nothing.
+    loop = asyncio.get_running_loop()
+    centers = await loop.run_in_executor(CV_POOL, _detect_color, img)
+    if not centers:
+        centers = await loop.run_in_executor(CV_POOL, _detect_adaptive, img)
+    
+    # Click the first candidate of the winning method
+    # (that's what dedup + max score used to pick)
+    if centers:
+        center_x, center_y = centers[0]
+        await page.mouse.click(region_x + center_x, region_y + center_y)
         return True
     
     return False
 
 
+async def wait_for_selector_quietly(page, selector, timeout, state='visible'):
+    """Wait for selector, returns False on timeout instead of raising"""
+    try:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def metrics_showing(page):
+    """True once the metrics label is on the page and no CAPTCHA iframe is left to solve"""
+    return (await page.query_selector(METRICS_SELECTOR) is not None
+            and await page.query_selector(CAPTCHA_SELECTOR) is None)
+
+
 async def scrape_ahrefs_domain(domain, proxy=None, page_loaded_callback=None):
     """
     Scrape a domain from Ahrefs
@@ -236,23 +295,26 @@ async def scrape_ahrefs_domain(domain, proxy=None, page_loaded_callback=None):
     
     try:
         # Build Ahrefs URL
-        _url = 'aHR0cHM6Ly9haHJlZnMuY29tL3dlYnNpdGUtYXV0aG9yaXR5LWNoZWNrZXI/aW5wdXQ9'
-        _url = base64.b64decode(_url).decode('utf-8')
-        url = f'{_url}{domain}'
+        url = f'{_AHREFS_URL_BASE}{domain}'
         
         # Navigate to page (Test 4: NO semaphore for navigation, only for context/page creation)
         print(f"🔄 Navigating to {domain}...")
-        await page.goto(url, wait_until='networkidle', timeout=30000)  # 30s timeout for faster failure detection
+        await page.goto(url, wait_until='domcontentloaded', timeout=30000)  # 30s timeout for faster failure detection
         print(f"🔍 Page loaded for {domain}")
         
-        await asyncio.sleep(10)
+        # Wait for whichever shows up first: a CAPTCHA or the metrics
+        await wait_for_selector_quietly(page, READY_SELECTOR, timeout=15000)
+        metrics_ready = await metrics_showing(page)
         
         # Handle CAPTCHA #1: Full Page CAPTCHA (appears first, left side)
-        first_captcha_found = await find_and_click_captcha(page, 'full_page')
-        
-        if first_captcha_found:
-            await asyncio.sleep(10)
-            await page.wait_for_load_state('networkidle')
+        if not metrics_ready:
+            first_captcha_found = await find_and_click_captcha(page, 'full_page')
+            
+            if first_captcha_found:
+                # Solved once the CAPTCHA frame goes away, then wait for the next page
+                await wait_for_selector_quietly(page, CAPTCHA_SELECTOR, timeout=20000, state='detached')
+                await wait_for_selector_quietly(page, READY_SELECTOR, timeout=15000)
+                metrics_ready = await metrics_showing(page)
         
         # Trigger callback to start next domain
         print(f"✨ First CAPTCHA handled for {domain}, starting next task...")
@@ -260,11 +322,11 @@ async def scrape_ahrefs_domain(domain, proxy=None, page_loaded_callback=None):
             await page_loaded_callback()
         
         # Handle CAPTCHA #2: Main Page CAPTCHA (appears on page, right-center)
-        second_captcha_found = await find_and_click_captcha(page, 'main_page')
-        
-        if second_captcha_found:
-            await asyncio.sleep(15)
-            await page.wait_for_load_state('networkidle')
+        if not metrics_ready:
+            second_captcha_found = await find_and_click_captcha(page, 'main_page')
+            
+            if second_captcha_found:
+                await wait_for_selector_quietly(page, METRICS_SELECTOR, timeout=20000)
         
         # Extract metrics
         metrics = await extract_metrics(page)
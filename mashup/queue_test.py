@@ -10,13 +10,16 @@ import json
 
 SERVER_URL = "http://127.0.0.1:8000"
 
+# One keep-alive session for every request (no new TCP connection per call)
+session = requests.Session()
+
 def submit_batch_and_monitor():
     """Submit a batch and monitor the queue"""
     
     # Submit batch of 5 domains
     print("📦 Submitting batch of 5 domains...\n")
     
-    response = requests.post(
+    response = session.post(
         f"{SERVER_URL}/batch",
         json={
             'domains': [
@@ -97,11 +100,11 @@ def submit_batch_and_monitor():
     try:
         while True:
             # Get queue status
-            queue_resp = requests.get(f"{SERVER_URL}/queue")
+            queue_resp = session.get(f"{SERVER_URL}/queue")
             queue_data = queue_resp.json()
             
             # Get health/stats
-            health_resp = requests.get(f"{SERVER_URL}/health")
+            health_resp = session.get(f"{SERVER_URL}/health")
             health_data = health_resp.json()
             
             # Clear previous output (optional)
@@ -126,14 +129,17 @@ def submit_batch_and_monitor():
     print("📋 FINAL RESULTS")
     print("=" * 80 + "\n")
     
+    # All results in one round-trip
+    all_results = session.post(f"{SERVER_URL}/results_bulk", json={'task_ids': task_ids}).json()
+    
     for i, task_id in enumerate(task_ids):
-        result_resp = requests.get(f"{SERVER_URL}/result/{task_id}")
-        result_data = result_resp.json()
+        result_data = all_results[task_id]
         
-        status = result_data['status']
-        domain = result_data['domain']
+        # Jobs evicted from the server come back as {'error': 'Job not found'}
+        status = result_data.get('status', 'not_found')
+        domain = result_data.get('domain', task_id)
         
-        status_icon = "✅" if status == "completed" else "❌" if status == "failed" else "⏳"
+        status_icon = "✅" if status == "completed" else "❌" if status == "failed" else "❔" if status == "not_found" else "⏳"
         print(f"{status_icon} {domain}: {status}")
         
         if status == "completed" and 'result' in result_data:
@@ -11,6 +11,9 @@ import json
 SERVER_URL = "http://127.0.0.1:8000"
 PROXY_FILE = "Webshare 100 proxies.txt"
 
+# One keep-alive session for every request (no new TCP connection per call)
+session = requests.Session()
+
 def load_proxies():
     """Load proxies from file"""
     proxies = []
@@ -132,7 +135,7 @@ def submit_batch_with_proxies():
     print(f"📦 Submitting batch of {len(domains)} domains with proxies...\n")
     print(f"   Using {len(proxies)} unique proxies (rotating)\n")
     
-    response = requests.post(
+    response = session.post(
         f"{SERVER_URL}/batch",
         json={'domains': batch_domains}
     )
@@ -150,28 +153,24 @@ def monitor_progress(task_ids):
     print("-" * 80)
     
     try:
-        while True:
-            # Get queue status
-            queue_resp = requests.get(f"{SERVER_URL}/queue")
-            queue_data = queue_resp.json()
-            
-            # Get health/stats
-            health_resp = requests.get(f"{SERVER_URL}/health")
-            health_data = health_resp.json()
-            
-            # Clear previous output (optional)
-            print(f"\r📊 Queue: {queue_data['queue_size']} | " +
-                  f"Processing: {queue_data['processing_count']} | " +
-                  f"Queued: {health_data['queued']} | " +
-                  f"Completed: {health_data['completed']} | " +
-                  f"Failed: {health_data['failed']}", end="")
-            
-            # Check if all done
-            if health_data['completed'] + health_data['failed'] >= len(task_ids):
-                print("\n\n✅ All tasks completed!")
-                break
-            
-            time.sleep(2)
+        # One Server-Sent Events subscription: the server pushes a snapshot on every change
+        with session.get(f"{SERVER_URL}/events", stream=True) as response:
+            for line in response.iter_lines(decode_unicode=True):
+                if not line or not line.startswith('data: '):
+                    continue  # keep-alive / blank separator
+                
+                state = json.loads(line[len('data: '):])
+                
+                print(f"\r📊 Queue: {state['queue_size']} | " +
+                      f"Processing: {state['processing_count']} | " +
+                      f"Queued: {state['queued']} | " +
+                      f"Completed: {state['completed']} | " +
+                      f"Failed: {state['failed']}", end="")
+                
+                # Check if all done
+                if state['completed'] + state['failed'] >= len(task_ids):
+                    print("\n\n✅ All tasks completed!")
+                    break
     
     except KeyboardInterrupt:
         print("\n\n⏸️  Monitoring stopped\n")
@@ -186,14 +185,16 @@ def show_results(task_ids):
     completed_count = 0
     failed_count = 0
     
+    # All results in one round-trip
+    all_results = session.post(f"{SERVER_URL}/results_bulk", json={'task_ids': task_ids}).json()
+    
     for i, task_id in enumerate(task_ids):
-        result_resp = requests.get(f"{SERVER_URL}/result/{task_id}")
-        result_data = result_resp.json()
-        
-        status = result_data['status']
-        domain = result_data['domain']
+        result_data = all_results[task_id]
+        # Jobs evicted from the server come back as {'error': 'Job not found'}
+        status = result_data.get('status', 'not_found')
+        domain = result_data.get('domain', task_id)
         
-        status_icon = "✅" if status == "completed" else "❌" if status == "failed" else "⏳"
+        status_icon = "✅" if status == "completed" else "❌" if status == "failed" else "❔" if status == "not_found" else "⏳"
         
         # Show domain with proxy info
         proxy_info = ""
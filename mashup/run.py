@@ -1,18 +1,22 @@
 #!/usr/bin/env python3
 """
-Ahrefs Scraper Flask Application
+Ahrefs Scraper Quart Application
 
 Main entry point for the scraping server.
 Uses queue system with 3 concurrent workers (Test 4 approach).
+Routes, queue workers and the browser all run on one asyncio event loop (served by uvicorn).
 """
 
-from flask import Flask, request, jsonify
+from quart import Quart, Response, request, jsonify
 import asyncio
-from threading import Thread
+import json
+import time
 import uuid
+from collections import deque
 from datetime import datetime
 from dotenv import load_dotenv
 import socket
+import uvicorn
 
 # Import helpers
 from camoufox_helper import initialize_browser, close_browser, get_context_pool_stats
@@ -20,184 +24,263 @@ from ahrefs_helper import scrape_ahrefs_domain
 
 load_dotenv()
 
-app = Flask(__name__)
+app = Quart(__name__)
 
 # In-memory storage for jobs and results
 jobs = {}
 results = {}
+status_counts = {'queued': 0, 'waiting': 0, 'processing': 0, 'completed': 0, 'failed': 0}  # jobs per status
 
-# Global event loop for all async operations
-global_loop = None
-loop_thread = None
+# Finished (completed/failed) jobs are kept for a while, then dropped with their results
+MAX_FINISHED_JOBS = 10000
+FINISHED_JOB_TTL = 24 * 60 * 60  # seconds
+finished_jobs = deque()  # (finished at, task_id), oldest first
 
-# Task queue for concurrent processing
-task_queue = []
-queue_lock = asyncio.Lock()
+# Task queue for concurrent processing (asyncio.Queue, created on the event loop at startup)
+task_queue = None
 
-# Concurrent processing control (3 workers, Test 4 approach, NO semaphore)
+# Concurrent processing control: MAX_CONCURRENT_PROCESSING persistent queue workers
 MAX_CONCURRENT_PROCESSING = 2
-current_processing_count = 0
-processing_count_lock = asyncio.Lock()
+queue_workers = []
+
+# Rate limit for starting scrapes (shared by all queue workers) - bursts get spaced out, not throttled by Ahrefs
+SCRAPE_RATE_PER_SECOND = 1.0
+next_scrape_slot = 0.0  # time.monotonic() at which the next scrape may start
+
+# Queue/job state change notifications (for /events subscribers)
+state_version = 0
+state_changed = asyncio.Event()  # replaced after every change, so each event fires once
+EVENTS_KEEPALIVE = 15  # seconds between keep-alive comments on an idle /events stream
 
 
 # ============================================================================
 # Queue Management Functions
 # ============================================================================
 
-async def process_next_task():
-    """Process one task from the queue (up to MAX_CONCURRENT_PROCESSING at a time)"""
-    global task_queue, current_processing_count
+def notify_state_change():
+    """Wake /events subscribers after a job or queue change"""
+    global state_version, state_changed
     
-    # Get next task
-    async with queue_lock:
-        if len(task_queue) == 0:
-            print("📭 Queue empty - no more tasks")
-            return
-        
-        task = task_queue.pop(0)
-        task_id = task['task_id']
-        domain = task['domain']
-        proxy = task.get('proxy')
+    state_version += 1
+    state_changed.set()
+    state_changed = asyncio.Event()
+
+
+def add_job(task_id, job):
+    """Store a new job and count it under its status"""
+    jobs[task_id] = job
+    status_counts[job['status']] += 1
+
+
+def set_job_status(task_id, status):
+    """Move a job to a new status, keeping status_counts in step"""
+    job = jobs[task_id]
+    previous = job['status']
+    status_counts[previous] -= 1
+    status_counts[status] += 1
+    job['status'] = status
+    
+    # Queue for eviction once, on the first move to a finished state (completed -> failed doesn't re-add it)
+    if status in ('completed', 'failed') and previous not in ('completed', 'failed'):
+        finished_jobs.append((time.monotonic(), task_id))
+
+
+def evict_finished_jobs():
+    """Drop the oldest finished jobs beyond MAX_FINISHED_JOBS or older than FINISHED_JOB_TTL
+    
+    Runs when a task finishes and on every read of jobs/results, so expired jobs go even while the queue is idle.
+    """
+    expired_before = time.monotonic() - FINISHED_JOB_TTL
+    while finished_jobs and (len(finished_jobs) > MAX_FINISHED_JOBS or finished_jobs[0][0] < expired_before):
+        _, task_id = finished_jobs.popleft()
+        job = jobs.pop(task_id, None)
+        if job is None:
+            continue
+        status_counts[job['status']] -= 1
+        results.pop(task_id, None)
+
+
+async def wait_for_scrape_slot(task_id):
+    """Wait until this worker may start a scrape (starts are 1/SCRAPE_RATE_PER_SECOND apart)
     
-    # Increment processing count
-    async with processing_count_lock:
-        current_processing_count += 1
-        processing = current_processing_count
+    The job is off the queue by now, so while it sleeps for its slot it is marked 'waiting' (not 'queued').
+    """
+    global next_scrape_slot
     
-    # Process this task
-    print(f"🔄 Processing from queue: {domain} (Processing: {processing}/{MAX_CONCURRENT_PROCESSING}, Queue: {len(task_queue)})")
+    # Reserve the slot before sleeping so concurrent workers queue up behind each other
+    now = time.monotonic()
+    slot = max(now, next_scrape_slot)
+    next_scrape_slot = slot + 1 / SCRAPE_RATE_PER_SECOND
     
-    # Callback to trigger next task when page loads
-    async def on_page_loaded():
-        print(f"✨ Page loaded for {domain}, checking for next task...")
-        await start_next_if_possible()
+    if slot > now:
+        set_job_status(task_id, 'waiting')
+        notify_state_change()
+        await asyncio.sleep(slot - now)
+
+
+async def process_task(task):
+    """Scrape one queued task and record its result"""
+    task_id = task['task_id']
+    domain = task['domain']
+    proxy = task.get('proxy')
+    
+    print(f"🔄 Processing from queue: {domain} (Queue: {task_queue.qsize()})")
     
     try:
-        jobs[task_id]['status'] = 'processing'
+        await wait_for_scrape_slot(task_id)
+        
+        set_job_status(task_id, 'processing')
         jobs[task_id]['started_at'] = datetime.now().isoformat()
+        notify_state_change()
         
         # Scrape the domain
-        result = await scrape_ahrefs_domain(domain, proxy, page_loaded_callback=on_page_loaded)
+        result = await scrape_ahrefs_domain(domain, proxy)
         
-        jobs[task_id]['status'] = 'completed'
+        set_job_status(task_id, 'completed')
         jobs[task_id]['completed_at'] = datetime.now().isoformat()
         results[task_id] = result
         
         print(f"✅ Task {task_id} completed: {domain}")
         
     except Exception as e:
-        jobs[task_id]['status'] = 'failed'
+        set_job_status(task_id, 'failed')
         jobs[task_id]['error'] = str(e)
         jobs[task_id]['completed_at'] = datetime.now().isoformat()
         print(f"❌ Task {task_id} failed: {e}")
     
     finally:
-        # Decrement processing count
-        async with processing_count_lock:
-            current_processing_count -= 1
-            processing = current_processing_count
-        
-        print(f"🏁 Task finished: {domain} (Processing now: {processing}/{MAX_CONCURRENT_PROCESSING})")
-        
-        # Try to start next task
-        await start_next_if_possible()
+        evict_finished_jobs()
+        notify_state_change()
+        print(f"🏁 Task finished: {domain}")
 
 
-async def start_next_if_possible():
-    """Start next task from queue if under the concurrent limit"""
-    global current_processing_count
-    
-    async with processing_count_lock:
-        can_start = current_processing_count < MAX_CONCURRENT_PROCESSING
-        processing = current_processing_count
+async def queue_worker(worker_id):
+    """Take tasks off the queue one at a time, forever"""
+    while True:
+        task = await task_queue.get()
+        try:
+            await process_task(task)
+        finally:
+            task_queue.task_done()
+
+
+async def start_queue_workers():
+    """Create the task queue and MAX_CONCURRENT_PROCESSING workers on the event loop"""
+    global task_queue
     
-    if can_start and len(task_queue) > 0:
-        print(f"🚀 Starting next task (Processing: {processing}/{MAX_CONCURRENT_PROCESSING})")
-        asyncio.create_task(process_next_task())
-    elif processing >= MAX_CONCURRENT_PROCESSING:
-        print(f"⏸️  At capacity ({MAX_CONCURRENT_PROCESSING}/{MAX_CONCURRENT_PROCESSING}), waiting for slot...")
-    else:
-        print(f"📭 No more tasks in queue")
+    task_queue = asyncio.Queue()
+    for worker_id in range(MAX_CONCURRENT_PROCESSING):
+        queue_workers.append(asyncio.create_task(queue_worker(worker_id)))
 
 
 async def add_task_to_queue(task_id, domain, proxy=None):
-    """Add a task to the queue and start processing if capacity available"""
-    global task_queue, current_processing_count
-    
-    # Add task to queue
-    async with queue_lock:
-        task_queue.append({
-            'task_id': task_id,
-            'domain': domain,
-            'proxy': proxy
-        })
-        queue_size = len(task_queue)
-    
-    async with processing_count_lock:
-        processing = current_processing_count
-    
-    print(f"📥 Added to queue: {domain} (Queue: {queue_size}, Processing: {processing}/{MAX_CONCURRENT_PROCESSING})")
+    """Add a task to the queue (the next free worker picks it up)"""
+    task_queue.put_nowait({
+        'task_id': task_id,
+        'domain': domain,
+        'proxy': proxy
+    })
+    notify_state_change()
     
-    # Try to start this task if we have capacity
-    await start_next_if_possible()
+    print(f"📥 Added to queue: {domain} (Queue: {task_queue.qsize()})")
 
 
-def run_async_task(task_id, domain, proxy=None):
-    """Submit task to the queue via global event loop"""
-    global global_loop
-    
-    if global_loop is None:
-        print(f"❌ Global loop not initialized")
-        return
+async def add_tasks_to_queue(tasks):
+    """Add many tasks (dicts with task_id, domain, proxy) to the queue in one pass"""
+    for task in tasks:
+        task_queue.put_nowait(task)
+    notify_state_change()
     
-    # Add task to queue (will be processed based on capacity)
-    asyncio.run_coroutine_threadsafe(add_task_to_queue(task_id, domain, proxy), global_loop)
+    print(f"📥 Added {len(tasks)} tasks to queue (Queue: {task_queue.qsize()})")
 
 
 # ============================================================================
-# Flask Routes
+# Routes
 # ============================================================================
 
 @app.route('/health', methods=['GET'])
-def health():
+async def health():
     """Health check endpoint"""
+    evict_finished_jobs()
+    
     return jsonify({
         'status': 'healthy',
         'tailscale_ip': get_tailscale_ip(),
         'total_jobs': len(jobs),
-        'queued': len([j for j in jobs.values() if j['status'] == 'queued']),
-        'processing': len([j for j in jobs.values() if j['status'] == 'processing']),
-        'completed': len([j for j in jobs.values() if j['status'] == 'completed']),
-        'failed': len([j for j in jobs.values() if j['status'] == 'failed']),
-        'queue_size': len(task_queue),
+        'queued': status_counts['queued'],
+        'waiting': status_counts['waiting'],
+        'processing': status_counts['processing'],
+        'completed': status_counts['completed'],
+        'failed': status_counts['failed'],
+        'queue_size': task_queue.qsize(),
         'max_concurrent': MAX_CONCURRENT_PROCESSING,
-        'current_processing': current_processing_count,
+        'current_processing': status_counts['processing'],
         'context_pool': get_context_pool_stats()
     })
 
 
 @app.route('/queue', methods=['GET'])
-def queue_status():
+async def queue_status():
     """Get current queue status"""
+    evict_finished_jobs()
+    
+    # Jobs still waiting in the queue, in submission order
     queue_items = []
-    for task in task_queue:
-        queue_items.append({
-            'task_id': task['task_id'],
-            'domain': task['domain'],
-            'has_proxy': task.get('proxy') is not None
-        })
+    for job in list(jobs.values()):
+        if job['status'] == 'queued':
+            queue_items.append({
+                'task_id': job['task_id'],
+                'domain': job['domain'],
+                'has_proxy': job.get('proxy') is not None
+            })
     
     return jsonify({
-        'queue_size': len(task_queue),
-        'processing_count': len([j for j in jobs.values() if j['status'] == 'processing']),
+        'queue_size': task_queue.qsize(),
+        'waiting_count': status_counts['waiting'],
+        'processing_count': status_counts['processing'],
         'queue': queue_items
     })
 
 
+def queue_snapshot():
+    """Queue size and job counts per status (payload of /events)"""
+    return {
+        'queue_size': task_queue.qsize(),
+        'waiting_count': status_counts['waiting'],
+        'processing_count': status_counts['processing'],
+        'queued': status_counts['queued'],
+        'completed': status_counts['completed'],
+        'failed': status_counts['failed']
+    }
+
+
+@app.route('/events', methods=['GET'])
+async def events():
+    """Server-Sent Events stream: one queue snapshot per state change"""
+    async def stream():
+        version = None
+        while True:
+            if version == state_version:
+                try:
+                    await asyncio.wait_for(state_changed.wait(), timeout=EVENTS_KEEPALIVE)
+                except asyncio.TimeoutError:
+                    pass
+            
+            if version != state_version:
+                version = state_version
+                yield f"data: {json.dumps(queue_snapshot())}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+    
+    response = Response(stream(), mimetype='text/event-stream', headers={'Cache-Control': 'no-cache'})
+    response.timeout = None  # stream stays open until the client disconnects
+    return response
+
+
 @app.route('/scrape', methods=['POST'])
-def scrape():
+async def scrape():
     """Submit a single scraping job"""
-    data = request.get_json()
+    data = await request.get_json()
     domain = data.get('domain')
     
     if not domain:
@@ -207,27 +290,21 @@ def scrape():
     task_id = str(uuid.uuid4())
     
     # Parse proxy if provided
-    proxy = None
-    if data.get('proxy_ip'):
-        proxy = {
-            'server': f"http://{data['proxy_ip']}:{data['proxy_port']}",
-            'username': data.get('proxy_user'),
-            'password': data.get('proxy_pass')
-        }
-    
-    jobs[task_id] = {
+    proxy = parse_request_proxy(data)
+    
+    add_job(task_id, {
         'task_id': task_id,
         'domain': domain,
         'status': 'queued',
         'created_at': datetime.now().isoformat(),
         'proxy': proxy.get('server') if proxy else None
-    }
+    })
     
     proxy_info = f" [proxy: {proxy.get('server')}]" if proxy else ""
     print(f"📥 New job {task_id}: {domain}{proxy_info}")
     
     # Add to queue (will be processed based on capacity)
-    run_async_task(task_id, domain, proxy)
+    await add_task_to_queue(task_id, domain, proxy)
     
     return jsonify({
         'task_id': task_id,
@@ -237,15 +314,17 @@ def scrape():
 
 
 @app.route('/batch', methods=['POST'])
-def batch_scrape():
+async def batch_scrape():
     """Submit multiple scraping jobs"""
-    data = request.get_json()
+    data = await request.get_json()
     domains_data = data.get('domains', [])
     
     if not domains_data:
         return jsonify({'error': 'Domains list is required'}), 400
     
     task_ids = []
+    tasks = []
+    created_at = datetime.now().isoformat()  # one timestamp for the whole batch
     
     for item in domains_data:
         # Handle both string domains and dict with proxy info
@@ -254,31 +333,26 @@ def batch_scrape():
             proxy = None
         else:
             domain = item.get('domain')
-            proxy = None
-            if item.get('proxy_ip'):
-                proxy = {
-                    'server': f"http://{item['proxy_ip']}:{item['proxy_port']}",
-                    'username': item.get('proxy_user'),
-                    'password': item.get('proxy_pass')
-                }
+            proxy = parse_request_proxy(item)
         
         if not domain:
             continue
         
         task_id = str(uuid.uuid4())
         
-        jobs[task_id] = {
+        add_job(task_id, {
             'task_id': task_id,
             'domain': domain,
             'status': 'queued',
-            'created_at': datetime.now().isoformat(),
+            'created_at': created_at,
             'proxy': proxy.get('server') if proxy else None
-        }
+        })
         
         task_ids.append(task_id)
-        
-        # Add to queue
-        run_async_task(task_id, domain, proxy)
+        tasks.append({'task_id': task_id, 'domain': domain, 'proxy': proxy})
+    
+    # Add the whole batch to the queue at once
+    await add_tasks_to_queue(tasks)
     
     print(f"📥 Batch job: {len(task_ids)} domains queued")
     
@@ -289,13 +363,8 @@ def batch_scrape():
     }), 202
 
 
-@app.route('/result/<task_id>', methods=['GET'])
-def get_result(task_id):
-    """Get result for a specific job"""
-    if task_id not in jobs:
-        return jsonify({'error': 'Job not found'}), 404
-    
-    job = jobs[task_id]
+def job_response(task_id, job):
+    """Public view of a job (status plus result/error/timing fields for its state)"""
     response = {
         'task_id': task_id,
         'domain': job['domain'],
@@ -313,12 +382,45 @@ def get_result(task_id):
     elif job['status'] == 'processing':
         response['started_at'] = job.get('started_at')
     
+    return response
+
+
+@app.route('/result/<task_id>', methods=['GET'])
+async def get_result(task_id):
+    """Get result for a specific job"""
+    evict_finished_jobs()
+    
+    if task_id not in jobs:
+        return jsonify({'error': 'Job not found'}), 404
+    
+    return jsonify(job_response(task_id, jobs[task_id]))
+
+
+@app.route('/results_bulk', methods=['POST'])
+async def get_results_bulk():
+    """Get results for many jobs in one request
+    
+    POST body: {"task_ids": ["...", "..."]}
+    Returns: {task_id: job result (same shape as /result/<task_id>)}
+    """
+    evict_finished_jobs()
+    
+    data = await request.get_json() or {}
+    task_ids = data.get('task_ids', [])
+    
+    response = {}
+    for task_id in task_ids:
+        job = jobs.get(task_id)
+        response[task_id] = job_response(task_id, job) if job else {'error': 'Job not found'}
+    
     return jsonify(response)
 
 
 @app.route('/jobs', methods=['GET'])
-def list_jobs():
+async def list_jobs():
     """List all jobs with optional status filter"""
+    evict_finished_jobs()
+    
     status_filter = request.args.get('status')
     
     filtered_jobs = []
@@ -337,8 +439,20 @@ def list_jobs():
 # Helper Functions
 # ============================================================================
 
-def get_tailscale_ip():
-    """Get the Tailscale IP address"""
+def parse_request_proxy(data):
+    """Build a Playwright proxy dict from proxy_ip/proxy_port/proxy_user/proxy_pass fields (None if no proxy_ip)"""
+    if not data.get('proxy_ip'):
+        return None
+    
+    return {
+        'server': f"http://{data['proxy_ip']}:{data['proxy_port']}",
+        'username': data.get('proxy_user'),
+        'password': data.get('proxy_pass')
+    }
+
+
+def resolve_tailscale_ip():
+    """Look up the Tailscale IP address (DNS lookup - done once at import)"""
     try:
         hostname = socket.gethostname()
         ip = socket.gethostbyname(hostname)
@@ -347,59 +461,47 @@ def get_tailscale_ip():
         return "100.124.226.72"  # Default fallback
 
 
-def run_event_loop():
-    """Run the global event loop in a background thread"""
-    global global_loop
-    global_loop = asyncio.new_event_loop()
-    asyncio.set_event_loop(global_loop)
-    global_loop.run_forever()
+TAILSCALE_IP = resolve_tailscale_ip()
+
+
+def get_tailscale_ip():
+    """Get the Tailscale IP address"""
+    return TAILSCALE_IP
 
 
 # ============================================================================
 # Startup & Shutdown
 # ============================================================================
 
-def startup():
-    """Initialize browser and start event loop"""
-    global loop_thread
-    
+@app.before_serving
+async def startup():
+    """Initialize browser and start the queue workers"""
     tailscale_ip = get_tailscale_ip()
     print(f"📍 Tailscale IP: {tailscale_ip}")
     print(f"🌐 Access from K8s: http://{tailscale_ip}:8000")
     print()
     
-    # Start event loop in background thread
-    print("🔧 Starting global event loop in background thread...")
-    loop_thread = Thread(target=run_event_loop, daemon=True)
-    loop_thread.start()
-    
-    # Wait a bit for loop to start
-    import time
-    time.sleep(0.5)
-    print("✅ Event loop started!")
+    # Initialize browser on the serving event loop
+    await initialize_browser()
     
-    # Initialize browser in the event loop
-    future = asyncio.run_coroutine_threadsafe(initialize_browser(), global_loop)
-    future.result(timeout=30)
+    # Start the queue workers
+    await start_queue_workers()
+    print(f"✅ {MAX_CONCURRENT_PROCESSING} queue workers started!")
     print("✅ Startup complete!")
 
 
-if __name__ == '__main__':
-    startup()
+@app.after_serving
+async def shutdown():
+    """Stop the queue workers and close the browser"""
+    print("\n🛑 Shutting down...")
     
-    try:
-        app.run(host='0.0.0.0', port=8000, debug=False)
-    finally:
-        # Cleanup on shutdown
-        print("\n🛑 Shutting down...")
-        if global_loop and global_loop.is_running():
-            # Close browser in the global loop
-            future = asyncio.run_coroutine_threadsafe(close_browser(), global_loop)
-            future.result(timeout=10)
-            
-            # Stop the event loop
-            global_loop.call_soon_threadsafe(global_loop.stop)
-            loop_thread.join(timeout=5)
-        
-        print("✅ Shutdown complete!")
+    for worker in queue_workers:
+        worker.cancel()
+    await asyncio.gather(*queue_workers, return_exceptions=True)
+    
+    await close_browser()
+    print("✅ Shutdown complete!")
 
+
+if __name__ == '__main__':
+    uvicorn.run(app, host='0.0.0.0', port=8000, loop='uvloop')
@@ -2,15 +2,22 @@
 """
 Simplified test server - Queue-based concurrent page loading
 Uses camoufox_helper + CAPTCHA solving from ahrefs_helper
+Quart app: routes, queue workers and the browser all run on one asyncio event loop (served by uvicorn).
 """
 
 import asyncio
+import itertools
 import threading
 import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
+from functools import lru_cache
 import cv2
 import numpy as np
-from flask import Flask, jsonify, request
+import uvicorn
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+from quart import Quart, jsonify, request
 from camoufox_helper import (
     initialize_browser, 
     close_browser, 
@@ -19,29 +26,82 @@ from camoufox_helper import (
     get_context_pool_stats
 )
 
-app = Flask(__name__)
+app = Quart(__name__)
 
 # Configuration
 MAX_CONCURRENT_PROCESSING = 4  # Number of concurrent workers
 DEBUG = False  # Set to True for verbose logging
 MAX_TIMEOUT_ERRORS = 5  # Restart browser after this many timeout errors
+MAX_STORED_RESULTS = 10000  # Per list (completed / failed) - oldest results are dropped beyond this
+RESULTS_PAGE_SIZE = 100  # Default /results page size (?limit=)
+
+# Page readiness: either a CAPTCHA iframe or the metrics block is on screen
+CAPTCHA_SELECTOR = 'iframe[src*="recaptcha"]'
+METRICS_SELECTOR = ':text-is("Domain Rating")'  # Exact label text - :text() is a case-insensitive substring match
+READY_SELECTOR = f'{CAPTCHA_SELECTOR}, {METRICS_SELECTOR}'
+METRICS_HYDRATE_DELAY = 0.5  # s - lets the numbers next to the label render after it shows up
+
+# CAPTCHA checkbox position filters: (x0, y0, x1, y1) the checkbox center must lie strictly inside
+CAPTCHA_REGIONS = {
+    'full_page': (150, 200, 400, 400),  # Full page captcha - LEFT side of screen
+    'main_page': (500, 300, 900, 550)   # Main page captcha - RIGHT-CENTER area
+}
+CAPTCHA_ROI_MARGIN = 32  # px around the region, so a checkbox centered at its edge is still fully inside the crop
+CAPTCHA_CV_SCALE = 2  # Contours are found on the crop downscaled by this factor (checkbox is still 9-16 px there)
+COLOR_SHORTCUT_SCORE = 31  # Best adaptive/canny score is 8 + 20 (position) + 3 (square) - color wins ties
+
+# White/light checkbox fill: every BGR channel >= 200 and low chroma (max - min channel <= WHITE_MAX_CHROMA),
+# so light tints like (200, 255, 255) don't pass
+WHITE_LOWER = np.array([200, 200, 200], np.uint8)
+WHITE_UPPER = np.array([255, 255, 255], np.uint8)
+WHITE_MAX_CHROMA = 30
+
+# 3x3 dilation kernel that joins broken Canny edges
+DILATE_KERNEL = cv2.getStructuringElement(cv2.MORPH_RECT, (3, 3))
+
+# Screenshot clip: the smallest rectangle holding every region + margin (the rest of the page is never analyzed)
+_capture_x = min(region[0] for region in CAPTCHA_REGIONS.values()) - CAPTCHA_ROI_MARGIN
+_capture_y = min(region[1] for region in CAPTCHA_REGIONS.values()) - CAPTCHA_ROI_MARGIN
+CAPTCHA_CAPTURE_CLIP = {
+    'x': _capture_x,
+    'y': _capture_y,
+    'width': max(region[2] for region in CAPTCHA_REGIONS.values()) + CAPTCHA_ROI_MARGIN - _capture_x,
+    'height': max(region[3] for region in CAPTCHA_REGIONS.values()) + CAPTCHA_ROI_MARGIN - _capture_y
+}
+
+# CAPTCHA detection runs off the event loop (cv2 releases the GIL), one thread per concurrent page.
+# Single-threaded OpenCV so the pool threads don't oversubscribe the cores.
+cv2.setNumThreads(1)
+CV_POOL = ThreadPoolExecutor(max_workers=MAX_CONCURRENT_PROCESSING)
+
+# Per-thread scratch images for CAPTCHA detection, one per (name, shape) - reused instead of
+# allocating fresh intermediates on every check
+_scratch = threading.local()
 
 # Queue and processing state
-task_queue = []
-current_processing_count = 0
-processing_count_lock = threading.Lock()
+task_queue = None  # asyncio.Queue, created on the serving event loop in initialize_server()
+queued_tasks = {}  # task id -> task data still waiting in task_queue (for the /queue routes)
+task_ids = itertools.count(1)
+current_processing_count = 0  # Only changed by the queue workers
+queue_workers = []
+worker_pages = {}  # worker id -> (proxy server or None, page) - each worker's page, reused across its domains
 
 # Error tracking
 timeout_error_count = 0
 timeout_error_lock = threading.Lock()
 
-# Global event loop and thread
-global_loop = None
-loop_thread = None
+# Results storage (bounded - appending to a full deque drops the oldest entry)
+completed_tasks = deque(maxlen=MAX_STORED_RESULTS)
+failed_tasks = deque(maxlen=MAX_STORED_RESULTS)
 
-# Results storage
-completed_tasks = []
-failed_tasks = []
+
+@lru_cache(maxsize=256)
+def _parse_proxy_parts(proxy_string):
+    """Split ip:port:user:pass once per distinct proxy string"""
+    parts = proxy_string.split(':')
+    if len(parts) >= 4:
+        return f"http://{parts[0]}:{parts[1]}", parts[2], parts[3]
+    return None
 
 
 def parse_proxy(proxy_string):
@@ -49,12 +109,14 @@ def parse_proxy(proxy_string):
     if not proxy_string:
         return None
     
-    parts = proxy_string.split(':')
-    if len(parts) >= 4:
+    parts = _parse_proxy_parts(proxy_string)
+    if parts:
+        # Fresh dict per call - callers may hold on to / modify it
+        server, username, password = parts
         return {
-            'server': f"http://{parts[0]}:{parts[1]}",
-            'username': parts[2],
-            'password': parts[3]
+            'server': server,
+            'username': username,
+            'password': password
         }
     return None
 
@@ -68,8 +130,9 @@ async def restart_browser():
     print("=" * 80)
     
     try:
-        # Close existing browser
+        # Close existing browser (worker pages go with it)
         await close_browser()
+        worker_pages.clear()
         print("✅ Old browser closed")
         
         # Wait a bit
@@ -94,129 +157,99 @@ async def restart_browser():
             timeout_error_count = 0
 
 
-async def extract_metrics(page):
-    """Extract DR, backlinks, and linking websites from Ahrefs page"""
-    metrics = await page.evaluate("""
-        () => {
-            let dr = null;
-            let backlinks = null;
-            let linkingWebsites = null;
-            
-            const allElements = Array.from(document.querySelectorAll('*'));
-            
-            const drLabel = allElements.find(el => el.textContent.trim() === 'Domain Rating');
-            const backlinksLabel = allElements.find(el => el.textContent.trim() === 'Backlinks');
-            const linkingLabel = allElements.find(el => el.textContent.trim() === 'Linking websites');
-            
-            const findNumber = (label) => {
-                if (!label) return null;
-                
-                let parent = label;
-                for (let i = 0; i < 8; i++) {
-                    parent = parent.parentElement;
-                    if (!parent) break;
-                    
-                    const spans = parent.querySelectorAll('span');
-                    for (const span of spans) {
-                        const text = span.textContent.trim();
-                        const fontSize = window.getComputedStyle(span).fontSize;
-                        
-                        if (text && /^[0-9.,KM]+$/.test(text) && parseFloat(fontSize) > 25) {
-                            return text;
-                        }
-                    }
-                }
-                return null;
-            };
+# Metrics extraction script - built once, sent as-is on every evaluate
+EXTRACT_METRICS_JS = """
+    () => {
+        let dr = null;
+        let backlinks = null;
+        let linkingWebsites = null;
+        
+        // One pass over text nodes finds all three labels (outermost element whose
+        // whole text is the label - the same element a document-order scan of '*' finds)
+        const labels = new Map([['Domain Rating', null], ['Backlinks', null], ['Linking websites', null]]);
+        let remaining = labels.size;
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        
+        while (remaining > 0 && walker.nextNode()) {
+            const text = walker.currentNode.data.trim();
+            if (!labels.has(text) || labels.get(text)) continue;
             
-            dr = findNumber(drLabel);
-            backlinks = findNumber(backlinksLabel);
-            linkingWebsites = findNumber(linkingLabel);
+            let el = walker.currentNode.parentElement;
+            if (!el || el.textContent.trim() !== text) continue;
+            while (el.parentElement && el.parentElement.textContent.trim() === text) {
+                el = el.parentElement;
+            }
             
-            return {
-                _dr: dr,
-                backlinks: backlinks,
-                linking_websites: linkingWebsites
-            };
+            labels.set(text, el);
+            remaining--;
         }
-    """)
-    
-    def convert_to_int(value):
-        if not value:
-            return None
         
-        value = str(value).replace(',', '')
+        // Big numeric spans, collected once in document order (getComputedStyle runs once per span,
+        // not once per span per ancestor level per label)
+        const NUM_RE = /^[0-9.,KM]+$/;
+        const bigNumbers = [];
+        for (const span of document.querySelectorAll('span')) {
+            const text = span.textContent.trim();
+            if (text && NUM_RE.test(text) && parseFloat(window.getComputedStyle(span).fontSize) > 25) {
+                bigNumbers.push([span, text]);
+            }
+        }
         
-        if 'K' in value:
-            return int(float(value.replace('K', '')) * 1000)
-        elif 'M' in value:
-            return int(float(value.replace('M', '')) * 1000000)
-        else:
-            return int(float(value))
-    
-    return {
-        '_dr': convert_to_int(metrics['_dr']),
-        'backlinks': convert_to_int(metrics['backlinks']),
-        'linking_websites': convert_to_int(metrics['linking_websites'])
-    }
-    """Extract DR, backlinks, and linking websites from Ahrefs page"""
-    metrics = await page.evaluate("""
-        () => {
-            let dr = null;
-            let backlinks = null;
-            let linkingWebsites = null;
-            
-            const allElements = Array.from(document.querySelectorAll('*'));
+        // Closest ancestor (up to 8 levels) containing a big number wins
+        const findNumber = (label) => {
+            if (!label) return null;
             
-            const drLabel = allElements.find(el => el.textContent.trim() === 'Domain Rating');
-            const backlinksLabel = allElements.find(el => el.textContent.trim() === 'Backlinks');
-            const linkingLabel = allElements.find(el => el.textContent.trim() === 'Linking websites');
-            
-            const findNumber = (label) => {
-                if (!label) return null;
+            let parent = label;
+            for (let i = 0; i < 8; i++) {
+                parent = parent.parentElement;
+                if (!parent) break;
                 
-                let parent = label;
-                for (let i = 0; i < 8; i++) {
-                    parent = parent.parentElement;
-                    if (!parent) break;
-                    
-                    const spans = parent.querySelectorAll('span');
-                    for (const span of spans) {
-                        const text = span.textContent.trim();
-                        const fontSize = window.getComputedStyle(span).fontSize;
-                        
-                        if (text && /^[0-9.,KM]+$/.test(text) && parseFloat(fontSize) > 25) {
-                            return text;
-                        }
+                for (const [span, text] of bigNumbers) {
+                    if (parent.contains(span)) {
+                        return text;
                     }
                 }
-                return null;
-            };
-            
-            dr = findNumber(drLabel);
-            backlinks = findNumber(backlinksLabel);
-            linkingWebsites = findNumber(linkingLabel);
-            
-            return {
-                _dr: dr,
-                backlinks: backlinks,
-                linking_websites: linkingWebsites
-            };
-        }
-    """)
-    
-    def convert_to_int(value):
-        if not value:
-            return None
+            }
+            return null;
+        };
         
-        value = str(value).replace(',', '')
+        dr = findNumber(labels.get('Domain Rating'));
+        backlinks = findNumber(labels.get('Backlinks'));
+        linkingWebsites = findNumber(labels.get('Linking websites'));
         
-        if 'K' in value:
-            return int(float(value.replace('K', '')) * 1000)
-        elif 'M' in value:
-            return int(float(value.replace('M', '')) * 1000000)
-        else:
-            return int(float(value))
+        return {
+            _dr: dr,
+            backlinks: backlinks,
+            linking_websites: linkingWebsites
+        };
+    }
+"""
+
+
+# Metric suffixes ('1.2K', '3.4M') - the JS only returns [0-9.,KM] strings, suffix last
+METRIC_MULTIPLIERS = {'K': 1000, 'M': 1000000}
+
+
+def convert_to_int(value):
+    """Metric text ('1,234', '1.2K', '3.4M') to int, None if missing"""
+    if not value:
+        return None
+    
+    value = value.replace(',', '')
+    
+    # Plain integers (the common case) skip float parsing entirely
+    if value.isdigit():
+        return int(value)
+    
+    multiplier = METRIC_MULTIPLIERS.get(value[-1])
+    if multiplier:
+        return int(float(value[:-1]) * multiplier)
+    return int(float(value))
+
+
+async def extract_metrics(page):
+    """Extract DR, backlinks, and linking websites from Ahrefs page"""
+    metrics = await page.evaluate(EXTRACT_METRICS_JS)
     
     return {
         '_dr': convert_to_int(metrics['_dr']),
@@ -225,227 +258,269 @@ async def extract_metrics(page):
     }
 
 
-async def find_and_click_captcha(page, captcha_type):
+def _scratch_buffer(name, shape):
+    """Reusable uint8 buffer owned by the calling thread"""
+    buffers = getattr(_scratch, 'buffers', None)
+    if buffers is None:
+        buffers = _scratch.buffers = {}
+    
+    key = (name, shape)
+    buf = buffers.get(key)
+    if buf is None:
+        buf = buffers[key] = np.empty(shape, np.uint8)
+    return buf
+
+
+def _white_mask(img):
+    """Mask of near-white pixels: every BGR channel >= 200 and max - min channel <= WHITE_MAX_CHROMA"""
+    shape = img.shape[:2]
+    white_mask = cv2.inRange(img, WHITE_LOWER, WHITE_UPPER, dst=_scratch_buffer('white_mask', shape))
+    
+    # max - min channel = the largest absolute difference between two channels
+    b = cv2.extractChannel(img, 0, dst=_scratch_buffer('channel_b', shape))
+    g = cv2.extractChannel(img, 1, dst=_scratch_buffer('channel_g', shape))
+    r = cv2.extractChannel(img, 2, dst=_scratch_buffer('channel_r', shape))
+    chroma = cv2.absdiff(b, g, dst=_scratch_buffer('chroma', shape))
+    pair_diff = _scratch_buffer('chroma_pair', shape)
+    cv2.max(chroma, cv2.absdiff(g, r, dst=pair_diff), dst=chroma)
+    cv2.max(chroma, cv2.absdiff(b, r, dst=pair_diff), dst=chroma)
+    
+    neutral_mask = cv2.inRange(chroma, 0, WHITE_MAX_CHROMA, dst=_scratch_buffer('neutral_mask', shape))
+    return cv2.bitwise_and(white_mask, neutral_mask, dst=white_mask)
+
+
+def _checkbox_candidates(contours, method, score, offset_x, offset_y, region, scale=1):
+    """
+    Contours that look like a checkbox, as scored candidate dicts (page coordinates)
+    
+    Bounding rects are scaled back to page pixels first, then the size (18-32 px),
+    squareness and position filters run on all of them at once; contourArea is
+    only computed for the survivors.
+    
+    Args:
+        contours: findContours output for the cropped image
+        method: Detection method name stored on each candidate
+        score: Base score for this method
+        offset_x, offset_y: Page coordinates of the crop's top-left corner
+        region: (x0, y0, x1, y1) the checkbox center must lie strictly inside
+        scale: Factor the crop was downscaled by before findContours
+    """
+    if not contours:
+        return []
+    
+    rects = np.array([cv2.boundingRect(contour) for contour in contours]) * scale
+    x = rects[:, 0] + offset_x
+    y = rects[:, 1] + offset_y
+    w = rects[:, 2]
+    h = rects[:, 3]
+    aspect_ratio = w / np.maximum(h, 1)
+    center_x = x + w // 2
+    center_y = y + h // 2
+    x0, y0, x1, y1 = region
+    
+    keep = ((w >= 18) & (w <= 32) & (h >= 18) & (h <= 32)      # Checkbox size filter (18-32 pixels)
+            & (aspect_ratio > 0.85) & (aspect_ratio < 1.15)    # Must be nearly square
+            & (center_x > x0) & (center_x < x1) & (center_y > y0) & (center_y < y1))  # Position filter
+    
+    candidates = []
+    for i in np.flatnonzero(keep):
+        if cv2.contourArea(contours[i]) * scale * scale < 300:
+            continue
+        
+        candidates.append({
+            'method': method,
+            'x': int(x[i]), 'y': int(y[i]), 'w': int(w[i]), 'h': int(h[i]),
+            'center_x': int(center_x[i]),
+            'center_y': int(center_y[i]),
+            'aspect_ratio': float(aspect_ratio[i]),
+            'score': score
+        })
+    
+    return candidates
+
+
+async def capture_page_image(page):
+    """
+    Screenshot the CAPTCHA area of the page (CAPTCHA_CAPTURE_CLIP) and decode it to a BGR image
+    
+    Returns:
+        numpy array, or None if the screenshot failed
+    """
+    try:
+        # PNG: no lossy JPEG re-encode in the browser, one lossless decode here
+        # scale='css': one image pixel per CSS pixel, so crop offsets map 1:1 to click coordinates
+        screenshot_bytes = await page.screenshot(
+            type='png',
+            clip=CAPTCHA_CAPTURE_CLIP,
+            scale='css',
+            animations='disabled'
+        )
+        img_array = np.frombuffer(screenshot_bytes, np.uint8)
+        return cv2.imdecode(img_array, cv2.IMREAD_COLOR)
+    except Exception as e:
+        if DEBUG:
+            print(f"   ⚠️  Screenshot failed: {str(e)[:100]}")
+        return None
+
+
+def _rank_candidates(checkbox_candidates, captcha_type):
     """
-    Find and click CAPTCHA checkbox using computer vision
-    (EXACT COPY from server.py with 3 detection methods + scoring)
+    Deduplicate, score (expected position + squareness) and sort checkbox candidates, best first
+    
+    Returns scored copies; the input candidates are left with their base scores.
+    """
+    # Deduplicate candidates: one per 15px grid cell, keeping the highest score
+    best_per_cell = {}
+    for candidate in checkbox_candidates:
+        cell = (candidate['center_x'] // 15, candidate['center_y'] // 15)
+        if cell not in best_per_cell or candidate['score'] > best_per_cell[cell]['score']:
+            best_per_cell[cell] = candidate
+    
+    checkbox_candidates = list(best_per_cell.values())
+    
+    # Score candidates based on position and characteristics (on copies - the inputs keep their base score)
+    ranked = []
+    for candidate in checkbox_candidates:
+        candidate = dict(candidate)
+        ranked.append(candidate)
+        center_x = candidate['center_x']
+        center_y = candidate['center_y']
+        
+        # Expected position - COMPLETELY DIFFERENT for each captcha type
+        if captcha_type == 'full_page':
+            # Full page captcha - LEFT side (from screenshots: ~222, 288)
+            expected_x = 240
+            expected_y = 290
+        else:  # main_page
+            # Main page captcha - RIGHT-CENTER area (from screenshots: ~680, 430)
+            expected_x = 680
+            expected_y = 430
+        
+        dist_x = abs(center_x - expected_x)
+        dist_y = abs(center_y - expected_y)
+        
+        # Closer to expected position = higher score
+        if dist_x < 30 and dist_y < 30:
+            candidate['score'] += 20
+        elif dist_x < 50 and dist_y < 50:
+            candidate['score'] += 15
+        elif dist_x < 80 and dist_y < 80:
+            candidate['score'] += 10
+        elif dist_x < 120 and dist_y < 120:
+            candidate['score'] += 5
+        
+        # Perfect square aspect ratio
+        if 0.95 < candidate['aspect_ratio'] < 1.05:
+            candidate['score'] += 3
+    
+    # Sort by score (stable - earlier methods win ties)
+    ranked.sort(key=lambda c: c['score'], reverse=True)
+    
+    return ranked
+
+
+def detect_captcha_checkbox(img, captcha_type):
+    """
+    Find the most likely CAPTCHA checkbox in a capture_page_image() image
+    (3 detection methods + scoring) - plain OpenCV, run on CV_POOL
+    
+    Args:
+        img: Decoded CAPTCHA-area screenshot (from capture_page_image)
+        captcha_type: 'full_page' or 'main_page'
+    
+    Returns:
+        dict: Best candidate (center_x / center_y in page coordinates), or None
+    """
+    # Crop to the region this captcha type can appear in (all methods run on the crop only)
+    x0, y0, x1, y1 = CAPTCHA_REGIONS[captcha_type]
+    roi_x = x0 - CAPTCHA_ROI_MARGIN  # page coordinates of the crop
+    roi_y = y0 - CAPTCHA_ROI_MARGIN
+    img = img[roi_y - CAPTCHA_CAPTURE_CLIP['y']:y1 + CAPTCHA_ROI_MARGIN - CAPTCHA_CAPTURE_CLIP['y'],
+              roi_x - CAPTCHA_CAPTURE_CLIP['x']:x1 + CAPTCHA_ROI_MARGIN - CAPTCHA_CAPTURE_CLIP['x']]
+    
+    # Detect at reduced resolution (4x fewer pixels) - candidates are scaled back to page pixels
+    # Intermediates go into the calling thread's scratch buffers
+    small_h, small_w = img.shape[0] // CAPTCHA_CV_SCALE, img.shape[1] // CAPTCHA_CV_SCALE
+    img = cv2.resize(img, (small_w, small_h), dst=_scratch_buffer('small', (small_h, small_w, 3)),
+                     interpolation=cv2.INTER_AREA)
+    gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY, dst=_scratch_buffer('gray', (small_h, small_w)))
+    
+    checkbox_candidates = []
+    
+    # METHOD 1: Color-based detection (look for white/light squares)
+    # Create mask for white/light gray areas (checkbox is white) - bright in every BGR channel and
+    # nearly colorless, without a full-frame HSV conversion
+    white_mask = _white_mask(img)
+                
+    # Find contours in white mask
+    contours_white, _ = cv2.findContours(white_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    
+    checkbox_candidates.extend(
+        _checkbox_candidates(contours_white, 'color', 10, roi_x, roi_y, (x0, y0, x1, y1), CAPTCHA_CV_SCALE)  # Base score for color method
+    )
+    
+    # Shortcut: a color hit scoring COLOR_SHORTCUT_SCORE or more can't be beaten by the other methods
+    ranked = _rank_candidates(checkbox_candidates, captcha_type)
+    if ranked and ranked[0]['score'] >= COLOR_SHORTCUT_SCORE:
+        return ranked[0]
+    
+    # METHOD 2: Adaptive threshold edge detection
+    adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
+                                             cv2.THRESH_BINARY, 11, 2,
+                                             dst=_scratch_buffer('adaptive_thresh', gray.shape))
+    
+    # Invert so checkbox border is white (in place)
+    cv2.bitwise_not(adaptive_thresh, dst=adaptive_thresh)
+    
+    # Find contours
+    contours_adaptive, _ = cv2.findContours(adaptive_thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    
+    checkbox_candidates.extend(
+        _checkbox_candidates(contours_adaptive, 'adaptive', 8, roi_x, roi_y, (x0, y0, x1, y1), CAPTCHA_CV_SCALE)
+    )
+    
+    # METHOD 3: Canny edges
+    # One pass at the lowest thresholds - its edge map covers what the higher threshold pairs found
+    edges = cv2.Canny(gray, 10, 50, edges=_scratch_buffer('edges', gray.shape))
+    
+    # Dilate to connect edges
+    edges = cv2.dilate(edges, DILATE_KERNEL, dst=_scratch_buffer('edges_dilated', gray.shape),
+                       iterations=1)  # 1 px here is 2 px at page resolution
+    
+    contours_canny, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+    
+    checkbox_candidates.extend(
+        _checkbox_candidates(contours_canny, 'canny', 6, roi_x, roi_y, (x0, y0, x1, y1), CAPTCHA_CV_SCALE)
+    )
+    
+    ranked = _rank_candidates(checkbox_candidates, captcha_type)
+    return ranked[0] if ranked else None
+
+
+async def find_and_click_captcha(page, captcha_type, page_img=None):
+    """
+    Find and click CAPTCHA checkbox using computer vision (detect_captcha_checkbox)
     
     Args:
         page: Playwright page object
         captcha_type: 'full_page' or 'main_page'
+        page_img: Decoded screenshot to search (from capture_page_image) - taken now if None
     
     Returns:
         bool: True if checkbox found and clicked, False otherwise
     """
     try:
-        # Take screenshot
-        screenshot_bytes = await page.screenshot()
-        img_array = np.frombuffer(screenshot_bytes, np.uint8)
-        img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
-        gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
-        
-        checkbox_candidates = []
-        
-        # METHOD 1: Color-based detection (look for white/light squares)
-        hsv = cv2.cvtColor(img, cv2.COLOR_BGR2HSV)
-        
-        # Create mask for white/light gray areas (checkbox is white)
-        lower_white = np.array([0, 0, 200])
-        upper_white = np.array([180, 30, 255])
-        white_mask = cv2.inRange(hsv, lower_white, upper_white)
-                    
-        # Find contours in white mask
-        contours_white, _ = cv2.findContours(white_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        
-        for contour in contours_white:
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            # Checkbox size filter (18-32 pixels)
-            if not (18 <= w <= 32 and 18 <= h <= 32):
-                continue
-            
-            # Must be nearly square
-            aspect_ratio = w / h if h > 0 else 0
-            if not (0.85 < aspect_ratio < 1.15):
-                continue
-            
-            area = cv2.contourArea(contour)
-            if area < 300:
-                continue
-            
-            center_x = x + w // 2
-            center_y = y + h // 2
-            
-            # Position filter - DIFFERENT for each captcha type
-            if captcha_type == 'full_page':
-                # Full page captcha - LEFT side of screen (x: 150-400, y: 200-400)
-                if not (150 < center_x < 400 and 200 < center_y < 400):
-                    continue
-            else:  # main_page
-                # Main page captcha - RIGHT-CENTER area (x: 500-900, y: 300-550)
-                if not (500 < center_x < 900 and 300 < center_y < 550):
-                    continue
-            
-            checkbox_candidates.append({
-                'method': 'color',
-                'x': x, 'y': y, 'w': w, 'h': h,
-                'center_x': center_x,
-                'center_y': center_y,
-                'aspect_ratio': aspect_ratio,
-                'score': 10  # Base score for color method
-            })
-        
-        # METHOD 2: Adaptive threshold edge detection
-        adaptive_thresh = cv2.adaptiveThreshold(gray, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, 
-                                                 cv2.THRESH_BINARY, 11, 2)
-        
-        # Invert so checkbox border is white
-        adaptive_thresh = cv2.bitwise_not(adaptive_thresh)
-        
-        # Find contours
-        contours_adaptive, _ = cv2.findContours(adaptive_thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-        
-        for contour in contours_adaptive:
-            x, y, w, h = cv2.boundingRect(contour)
-            
-            if not (18 <= w <= 32 and 18 <= h <= 32):
-                continue
-            
-            aspect_ratio = w / h if h > 0 else 0
-            if not (0.85 < aspect_ratio < 1.15):
-                continue
-            
-            area = cv2.contourArea(contour)
-            if area < 300:
-                continue
-            
-            center_x = x + w // 2
-            center_y = y + h // 2
-            
-            # Position filter - DIFFERENT for each captcha type
-            if captcha_type == 'full_page':
-                # Full page captcha - LEFT side
-                if not (150 < center_x < 400 and 200 < center_y < 400):
-                    continue
-            else:  # main_page
-                # Main page captcha - RIGHT-CENTER area
-                if not (500 < center_x < 900 and 300 < center_y < 550):
-                    continue
-            
-            checkbox_candidates.append({
-                'method': 'adaptive',
-                'x': x, 'y': y, 'w': w, 'h': h,
-                'center_x': center_x,
-                'center_y': center_y,
-                'aspect_ratio': aspect_ratio,
-                'score': 8
-            })
-        
-        # METHOD 3: Multiple Canny thresholds
-        # Try very low thresholds to catch subtle edges
-        for low_thresh, high_thresh in [(10, 50), (20, 60), (30, 90)]:
-            edges = cv2.Canny(gray, low_thresh, high_thresh)
-            
-            # Dilate to connect edges
-            kernel = np.ones((3, 3), np.uint8)
-            edges = cv2.dilate(edges, kernel, iterations=2)
-            
-            contours_canny, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-            
-            for contour in contours_canny:
-                x, y, w, h = cv2.boundingRect(contour)
-                
-                if not (18 <= w <= 32 and 18 <= h <= 32):
-                    continue
-                
-                aspect_ratio = w / h if h > 0 else 0
-                if not (0.85 < aspect_ratio < 1.15):
-                    continue
-                
-                area = cv2.contourArea(contour)
-                if area < 300:
-                    continue
-                
-                center_x = x + w // 2
-                center_y = y + h // 2
-                
-                # Position filter - DIFFERENT for each captcha type
-                if captcha_type == 'full_page':
-                    # Full page captcha - LEFT side
-                    if not (150 < center_x < 400 and 200 < center_y < 400):
-                        continue
-                else:  # main_page
-                    # Main page captcha - RIGHT-CENTER area
-                    if not (500 < center_x < 900 and 300 < center_y < 550):
-                        continue
-                
-                checkbox_candidates.append({
-                    'method': f'canny_{low_thresh}_{high_thresh}',
-                    'x': x, 'y': y, 'w': w, 'h': h,
-                    'center_x': center_x,
-                    'center_y': center_y,
-                    'aspect_ratio': aspect_ratio,
-                    'score': 6
-                })
-        
-        # Deduplicate candidates (remove those very close to each other)
-        def are_close(c1, c2, threshold=15):
-            return abs(c1['center_x'] - c2['center_x']) < threshold and abs(c1['center_y'] - c2['center_y']) < threshold
-        
-        unique_candidates = []
-        for candidate in checkbox_candidates:
-            is_duplicate = False
-            for unique in unique_candidates:
-                if are_close(candidate, unique):
-                    # Keep the one with higher score
-                    if candidate['score'] > unique['score']:
-                        unique_candidates.remove(unique)
-                        unique_candidates.append(candidate)
-                    is_duplicate = True
-                    break
-            if not is_duplicate:
-                unique_candidates.append(candidate)
-        
-        checkbox_candidates = unique_candidates
-        
-        # Score candidates based on position and characteristics
-        for candidate in checkbox_candidates:
-            center_x = candidate['center_x']
-            center_y = candidate['center_y']
-            
-            # Expected position - COMPLETELY DIFFERENT for each captcha type
-            if captcha_type == 'full_page':
-                # Full page captcha - LEFT side (from screenshots: ~222, 288)
-                expected_x = 240
-                expected_y = 290
-            else:  # main_page
-                # Main page captcha - RIGHT-CENTER area (from screenshots: ~680, 430)
-                expected_x = 680
-                expected_y = 430
-            
-            dist_x = abs(center_x - expected_x)
-            dist_y = abs(center_y - expected_y)
-            
-            # Closer to expected position = higher score
-            if dist_x < 30 and dist_y < 30:
-                candidate['score'] += 20
-            elif dist_x < 50 and dist_y < 50:
-                candidate['score'] += 15
-            elif dist_x < 80 and dist_y < 80:
-                candidate['score'] += 10
-            elif dist_x < 120 and dist_y < 120:
-                candidate['score'] += 5
-            
-            # Perfect square aspect ratio
-            if 0.95 < candidate['aspect_ratio'] < 1.05:
-                candidate['score'] += 3
+        # Take screenshot (unless the caller already has a current one)
+        img = page_img if page_img is not None else await capture_page_image(page)
+        if img is None:
+            return False
         
-        # Sort by score
-        checkbox_candidates.sort(key=lambda c: c['score'], reverse=True)
+        # OpenCV releases the GIL - detection runs on CV_POOL while the loop serves other pages
+        loop = asyncio.get_running_loop()
+        target = await loop.run_in_executor(CV_POOL, detect_captcha_checkbox, img, captcha_type)
         
         # Click the best candidate
-        if checkbox_candidates:
-            target = checkbox_candidates[0]
+        if target:
             click_x = target['center_x']
             click_y = target['center_y']
             
@@ -465,9 +540,58 @@ async def find_and_click_captcha(page, captcha_type):
         return False
 
 
-async def simple_page_load(domain, proxy=None):
+async def wait_for_selector_quietly(page, selector, timeout, state='visible'):
+    """Wait for selector, returns False on timeout instead of raising"""
+    try:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+
+async def metrics_showing(page):
+    """True once the metrics label is on the page and no CAPTCHA iframe is left to solve"""
+    return (await page.query_selector(METRICS_SELECTOR) is not None
+            and await page.query_selector(CAPTCHA_SELECTOR) is None)
+
+
+async def get_worker_page(worker_id, proxy, domain):
+    """
+    The worker's page for this proxy - kept open across the worker's domains (no per-domain
+    page setup, solved CAPTCHA cookies stay), replaced when the proxy changes or the page closed
+    """
+    proxy_key = proxy['server'] if proxy else None
+    
+    slot = worker_pages.get(worker_id)
+    if slot is not None:
+        slot_proxy_key, page = slot
+        if slot_proxy_key == proxy_key and not page.is_closed():
+            return page
+        await release_worker_page(worker_id)
+    
+    # Get or create context, then create page in context
+    context = await get_or_create_context(proxy)
+    page = await create_page_in_context(context, domain)
+    worker_pages[worker_id] = (proxy_key, page)
+    return page
+
+
+async def release_worker_page(worker_id):
+    """Close and forget the worker's page (after a failed load, a proxy change or at shutdown)"""
+    slot = worker_pages.pop(worker_id, None)
+    if slot is not None:
+        try:
+            await slot[1].close()
+        except Exception:
+            pass  # Already gone with its context/browser
+
+
+async def simple_page_load(domain, proxy=None, worker_id=None):
     """
     Ahrefs page loading with CAPTCHA solving and metrics extraction
+    
+    With a worker_id the worker's page is reused (and kept after a successful load);
+    without one a fresh page is created and closed again.
     """
     global timeout_error_count
     start_time = time.time()
@@ -476,11 +600,12 @@ async def simple_page_load(domain, proxy=None):
         if DEBUG:
             print(f"[{domain}] 🔄 Starting page load...")
         
-        # Get or create context
-        context = await get_or_create_context(proxy)
-        
-        # Create page in context
-        page = await create_page_in_context(context, domain)
+        if worker_id is not None:
+            page = await get_worker_page(worker_id, proxy, domain)
+        else:
+            context = await get_or_create_context(proxy)
+            page = await create_page_in_context(context, domain)
+        keep_page = False
         
         try:
             # Navigate to Ahrefs
@@ -501,22 +626,35 @@ async def simple_page_load(domain, proxy=None):
                         if timeout_error_count > 0:
                             timeout_error_count = max(0, timeout_error_count - 1)
                     
-                    # Wait for page to settle
-                    await asyncio.sleep(10)
-                    
-                    # Handle CAPTCHA #1: Full Page CAPTCHA (appears first, left side)
-                    first_captcha_found = await find_and_click_captcha(page, 'full_page')
+                    # Wait for whichever shows up first: a CAPTCHA or the metrics (no fixed settle delay)
+                    await wait_for_selector_quietly(page, READY_SELECTOR, timeout=15000)
+                    metrics_ready = await metrics_showing(page)
+                    first_captcha_found = False
+                    second_captcha_found = False
                     
-                    if first_captcha_found:
-                        await asyncio.sleep(10)
-                        await page.wait_for_load_state('networkidle')
+                    if not metrics_ready:
+                        # One screenshot serves both CAPTCHA checks unless the first click changes the page
+                        page_img = await capture_page_image(page)
+                        
+                        # Handle CAPTCHA #1: Full Page CAPTCHA (appears first, left side)
+                        first_captcha_found = await find_and_click_captcha(page, 'full_page', page_img)
+                        
+                        if first_captcha_found:
+                            # Solved once the CAPTCHA frame goes away, then wait for the next page
+                            await wait_for_selector_quietly(page, CAPTCHA_SELECTOR, timeout=20000, state='detached')
+                            await wait_for_selector_quietly(page, READY_SELECTOR, timeout=15000)
+                            metrics_ready = await metrics_showing(page)
+                            page_img = None  # stale - take a new screenshot
                     
-                    # Handle CAPTCHA #2: Main Page CAPTCHA (appears on page, right-center)
-                    second_captcha_found = await find_and_click_captcha(page, 'main_page')
+                    if not metrics_ready:
+                        # Handle CAPTCHA #2: Main Page CAPTCHA (appears on page, right-center)
+                        second_captcha_found = await find_and_click_captcha(page, 'main_page', page_img)
+                        
+                        if second_captcha_found:
+                            metrics_ready = await wait_for_selector_quietly(page, METRICS_SELECTOR, timeout=20000)
                     
-                    if second_captcha_found:
-                        await page.wait_for_load_state('networkidle')
-                        await asyncio.sleep(15)
+                    if metrics_ready:
+                        await asyncio.sleep(METRICS_HYDRATE_DELAY)
                     
                     # Extract metrics
                     metrics = await extract_metrics(page)
@@ -560,6 +698,7 @@ async def simple_page_load(domain, proxy=None):
                         'timestamp': datetime.now().isoformat()
                     }
                     
+                    keep_page = worker_id is not None
                     return result
                     
                 except Exception as e:
@@ -588,10 +727,14 @@ async def simple_page_load(domain, proxy=None):
                     raise
             
         finally:
-            # Close page (keep context open - Test 4 approach)
-            if DEBUG:
-                print(f"[{domain}] 🧹 Closing page...")
-            await page.close()
+            # Close page unless the worker keeps it for its next domain (context stays open - Test 4 approach)
+            if not keep_page:
+                if DEBUG:
+                    print(f"[{domain}] 🧹 Closing page...")
+                if worker_id is not None:
+                    await release_worker_page(worker_id)
+                else:
+                    await page.close()
             
     except Exception as e:
         elapsed = time.time() - start_time
@@ -607,84 +750,69 @@ async def simple_page_load(domain, proxy=None):
         }
 
 
-async def process_task(task_data):
+async def process_task(task_data, worker_id=None):
     """Process a single task from the queue"""
-    global current_processing_count
-    
     domain = task_data['domain']
     proxy = task_data.get('proxy')
     
-    try:
-        # Execute the simple page load
-        result = await simple_page_load(domain, proxy)
-        
-        # Store result
-        if result['success']:
-            completed_tasks.append(result)
-        else:
-            failed_tasks.append(result)
-        
-        return result
-        
-    finally:
-        # Decrement processing count
-        with processing_count_lock:
-            current_processing_count -= 1
-        
-        # Start next task if available
-        asyncio.create_task(start_task_from_queue())
+    # Execute the simple page load
+    result = await simple_page_load(domain, proxy, worker_id)
+    
+    # Store result
+    if result['success']:
+        completed_tasks.append(result)
+    else:
+        failed_tasks.append(result)
+    
+    return result
 
 
-async def start_task_from_queue():
-    """Start processing the next task from queue if conditions allow"""
+async def queue_worker(worker_id):
+    """Long-lived worker: processes tasks from task_queue one at a time (MAX_CONCURRENT_PROCESSING of these run)"""
     global current_processing_count
     
-    with processing_count_lock:
-        # Check if we can start a new task
-        if current_processing_count >= MAX_CONCURRENT_PROCESSING:
-            return False
-        
-        if not task_queue:
-            return False
-        
-        # Get next task
-        task_data = task_queue.pop(0)
+    while True:
+        task_data = await task_queue.get()
+        queued_tasks.pop(task_data['id'], None)
         current_processing_count += 1
-    
-    # Process task
-    asyncio.create_task(process_task(task_data))
-    return True
+        
+        try:
+            await process_task(task_data, worker_id)
+        except Exception as e:
+            print(f"❌ Worker {worker_id} error on {task_data['domain']}: {e}")
+        finally:
+            current_processing_count -= 1
+            task_queue.task_done()
 
 
 def add_task_to_queue(domain, proxy=None):
-    """Add a task to the queue and try to start it"""
+    """Add a task to the queue (the next free worker picks it up)"""
     task_data = {
+        'id': next(task_ids),
         'domain': domain,
         'proxy': proxy,
         'added_at': datetime.now().isoformat()
     }
     
-    task_queue.append(task_data)
-    
-    # Try to start processing
-    asyncio.run_coroutine_threadsafe(start_task_from_queue(), global_loop)
+    queued_tasks[task_data['id']] = task_data
+    task_queue.put_nowait(task_data)  # Unbounded queue - never waits
     
     return {
         'message': 'Task added to queue',
         'domain': domain,
-        'queue_position': len(task_queue),
+        'queue_position': len(queued_tasks),
         'current_processing': current_processing_count
     }
 
 
 # ============================================================================
-# Flask Routes
+# Routes
 # ============================================================================
 
 @app.route('/load', methods=['POST'])
-def load_domain():
+async def load_domain():
     """Load a single domain"""
-    data = request.json or {}
+    data = await request.get_json() or {}
     domain = data.get('domain')
     
     if not domain:
@@ -700,9 +828,9 @@ def load_domain():
 
 
 @app.route('/batch', methods=['POST'])
-def batch_load():
+async def batch_load():
     """Load multiple domains"""
-    data = request.json or {}
+    data = await request.get_json() or {}
     domains = data.get('domains', [])
     
     if not domains:
@@ -722,19 +850,19 @@ def batch_load():
     return jsonify({
         'message': f'Added {len(domains)} domains to queue',
         'domains': results,
-        'queue_length': len(task_queue),
+        'queue_length': len(queued_tasks),
         'current_processing': current_processing_count
     })
 
 
 @app.route('/queue', methods=['GET'])
-def get_queue_status():
+async def get_queue_status():
     """Get current queue status with detailed information"""
     # Get domains in queue
-    queued_domains = [task['domain'] for task in task_queue]
+    queued_domains = [task['domain'] for task in list(queued_tasks.values())]
     
     return jsonify({
-        'queue_length': len(task_queue),
+        'queue_length': len(queued_tasks),
         'processing_count': current_processing_count,
         'max_concurrent': MAX_CONCURRENT_PROCESSING,
         'completed_count': len(completed_tasks),
@@ -747,32 +875,43 @@ def get_queue_status():
 
 
 @app.route('/queue/details', methods=['GET'])
-def get_queue_details():
+async def get_queue_details():
     """Get detailed queue information including full task data"""
     return jsonify({
-        'queue': task_queue,
-        'queue_length': len(task_queue),
+        'queue': list(queued_tasks.values()),
+        'queue_length': len(queued_tasks),
         'processing_count': current_processing_count,
         'max_concurrent': MAX_CONCURRENT_PROCESSING
     })
 
 
 @app.route('/results', methods=['GET'])
-def get_results():
-    """Get all results"""
+async def get_results():
+    """Get results, one page at a time (?offset=0&limit=100, applied to completed and failed separately)
+    
+    completed_total / failed_total give each list's full length, so a client knows when it
+    has paged past the end of either list.
+    """
+    offset = max(request.args.get('offset', 0, type=int), 0)
+    limit = max(request.args.get('limit', RESULTS_PAGE_SIZE, type=int), 0)
+    
     return jsonify({
-        'completed': completed_tasks,
-        'failed': failed_tasks,
-        'total': len(completed_tasks) + len(failed_tasks)
+        'completed': list(itertools.islice(completed_tasks, offset, offset + limit)),
+        'failed': list(itertools.islice(failed_tasks, offset, offset + limit)),
+        'completed_total': len(completed_tasks),
+        'failed_total': len(failed_tasks),
+        'total': len(completed_tasks) + len(failed_tasks),
+        'offset': offset,
+        'limit': limit
     })
 
 
 @app.route('/health', methods=['GET'])
-def health():
+async def health():
     """Health check"""
     return jsonify({
         'status': 'healthy',
-        'queue_length': len(task_queue),
+        'queue_length': len(queued_tasks),
         'processing_count': current_processing_count,
         'timeout_errors': timeout_error_count,
         'max_timeout_errors': MAX_TIMEOUT_ERRORS
@@ -780,33 +919,39 @@ def health():
 
 
 # ============================================================================
-# Event Loop Management
+# Server Lifecycle
 # ============================================================================
 
-def run_event_loop(loop):
-    """Run the event loop in a separate thread"""
-    asyncio.set_event_loop(loop)
-    loop.run_forever()
-
-
 async def initialize_server():
-    """Initialize browser and global resources"""
+    """Initialize browser, the task queue and its workers"""
+    global task_queue
+    
     print("🚀 Initializing browser...")
     await initialize_browser()
     print("✅ Browser initialized!")
+    
+    task_queue = asyncio.Queue()
+    queue_workers[:] = [asyncio.create_task(queue_worker(i)) for i in range(MAX_CONCURRENT_PROCESSING)]
+    print(f"👷 Started {MAX_CONCURRENT_PROCESSING} queue workers")
 
 
 async def cleanup_server():
     """Cleanup resources"""
+    for worker in queue_workers:
+        worker.cancel()
+    await asyncio.gather(*queue_workers, return_exceptions=True)
+    
+    for worker_id in list(worker_pages):
+        await release_worker_page(worker_id)
+    
     print("🔒 Closing browser...")
     await close_browser()
     print("✅ Browser closed!")
 
 
-def startup():
+@app.before_serving
+async def startup():
     """Server startup"""
-    global global_loop, loop_thread
-    
     print("=" * 80)
     print("🚀 Starting Ahrefs Scraper with CAPTCHA Solving (run2.py)")
     print("=" * 80)
@@ -817,33 +962,21 @@ def startup():
     print(f"Auto-restart: After {MAX_TIMEOUT_ERRORS} timeout errors")
     print("=" * 80)
     
-    # Create and start event loop in separate thread
-    global_loop = asyncio.new_event_loop()
-    loop_thread = threading.Thread(target=run_event_loop, args=(global_loop,), daemon=True)
-    loop_thread.start()
-    
-    # Initialize browser
-    asyncio.run_coroutine_threadsafe(initialize_server(), global_loop).result()
+    await initialize_server()
     
     print("✅ Server ready!")
     print("=" * 80)
 
 
-def shutdown():
+@app.after_serving
+async def shutdown():
     """Server shutdown"""
-    global global_loop
-    
     print()
     print("=" * 80)
     print("🛑 Shutting down server...")
     print("=" * 80)
     
-    if global_loop:
-        # Cleanup
-        asyncio.run_coroutine_threadsafe(cleanup_server(), global_loop).result()
-        
-        # Stop event loop
-        global_loop.call_soon_threadsafe(global_loop.stop)
+    await cleanup_server()
     
     print("✅ Shutdown complete!")
 
@@ -854,27 +987,9 @@ def shutdown():
 
 if __name__ == '__main__':
     import os
-    import signal
-    import sys
     
     # Create screenshots directory
     os.makedirs('screenshots', exist_ok=True)
     
-    # Setup signal handlers
-    def signal_handler(sig, frame):
-        print("\n⚠️  Received interrupt signal...")
-        shutdown()
-        sys.exit(0)
-    
-    signal.signal(signal.SIGINT, signal_handler)
-    signal.signal(signal.SIGTERM, signal_handler)
-    
-    # Startup
-    startup()
-    
-    # Run Flask
-    try:
-        app.run(host='0.0.0.0', port=5001, debug=False, threaded=True)
-    finally:
-        shutdown()
-
+    # uvicorn handles SIGINT/SIGTERM and runs shutdown() on the way out
+    uvicorn.run(app, host='0.0.0.0', port=5001, loop='uvloop')
@@ -9,7 +9,7 @@ Architecture (Test 4 Approach for ALL - 100% Success Rate):
 - NO semaphore (testing if deadlock occurs on Mac)
 - NO new contexts per request (contexts are reused)
 - Browser is reused across all requests for better performance
-- Tasks are processed through a queue with 3 concurrent workers
+- Tasks are processed through a queue with 3 concurrent workers (SCRAPE_CONCURRENCY env var)
 - Browser is properly closed on server shutdown
 
 Context Pooling Strategy:
@@ -20,8 +20,8 @@ Context Pooling Strategy:
 
 Queue System:
 - All scrape requests are added to a queue
-- Up to 3 tasks can process concurrently (3 workers)
-- When a page loads (network idle), next task from queue starts automatically
+- Up to 3 tasks can process concurrently (3 long-lived queue workers, SCRAPE_CONCURRENCY to change)
+- Each worker takes the next task from the queue as soon as its current one finishes
 - This balances throughput with browser stability
 - Status flow: queued -> processing -> completed/failed
 
@@ -40,6 +40,7 @@ from threading import Thread
 import uuid
 from datetime import datetime
 from camoufox import AsyncCamoufox
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
 import cv2
 import numpy as np
 from dotenv import load_dotenv
@@ -68,14 +69,44 @@ context_pool_lock = asyncio.Lock()
 global_loop = None
 loop_thread = None
 
-# Task queue for concurrent processing
-task_queue = []
-queue_lock = asyncio.Lock()
+# Task queue for concurrent processing (FIFO, consumed by the queue_worker()s on global_loop)
+task_queue = asyncio.Queue()
+queued_tasks = {}  # task_id -> task still waiting in task_queue (readable from the Flask threads for /queue)
+queue_worker_futures = []  # The long-running queue_worker()s, started in startup()
 
-# Concurrent processing control (3 workers, Test 4 approach, NO semaphore)
-MAX_CONCURRENT_PROCESSING = 3
+# Concurrent processing control: one long-lived queue worker per slot, each scraping one domain at a time
+MAX_CONCURRENT_PROCESSING = int(os.getenv('SCRAPE_CONCURRENCY', '3'))
 current_processing_count = 0
-processing_count_lock = asyncio.Lock()
+
+# Ahrefs website authority checker URL (decoded once)
+_AHREFS_URL_BASE = base64.b64decode('aHR0cHM6Ly9haHJlZnMuY29tL3dlYnNpdGUtYXV0aG9yaXR5LWNoZWNrZXI/aW5wdXQ9').decode('utf-8')
+
+# Page readiness: wait for whichever shows up first - a CAPTCHA or the metrics - instead of fixed sleeps
+CAPTCHA_SELECTOR = 'iframe[src*="recaptcha"]'
+METRICS_SELECTOR = ':text-is("Domain Rating")'  # Exact label text - :text() is a case-insensitive substring match
+READY_SELECTOR = f'{CAPTCHA_SELECTOR}, {METRICS_SELECTOR}'
+METRICS_HYDRATE_DELAY = 0.5  # s - lets the numbers next to the label render after it shows up
+
+# CAPTCHA checkbox position filters: (x0, y0, x1, y1) the checkbox center must lie strictly inside
+CAPTCHA_REGIONS = {
+    'full_page': (150, 200, 400, 400),  # Full page captcha - LEFT side of screen
+    'main_page': (500, 300, 900, 550)   # Main page captcha - RIGHT-CENTER area
+}
+CAPTCHA_EXPECTED_POSITIONS = {
+    'full_page': (240, 290),  # Full page captcha - LEFT side (from your screenshot: ~222, 288)
+    'main_page': (680, 430)   # Main page captcha - RIGHT-CENTER area (from screenshots: ~680, 430)
+}
+CAPTCHA_ROI_MARGIN = 32  # px around the region, so a checkbox centered at its edge is still fully inside the crop
+
+# CAPTCHA screenshot: only the region (+ margin) being searched, as JPEG (much cheaper to
+# encode in the browser and decode here than PNG's inflate + filter passes)
+CAPTCHA_SCREENSHOT_QUALITY = 90  # Decodes as fast as q60; lower qualities blur the checkbox border
+
+# 3x3 kernel for dilating Canny edges (built once, not per threshold pass)
+DILATE_KERNEL = np.ones((3, 3), np.uint8)
+
+# CAPTCHA_DEBUG=1: draw the candidates / clicked checkbox and save them as captcha_debug_*.jpg
+DEBUG_DRAW = os.getenv('CAPTCHA_DEBUG') == '1'
 
 async def initialize_browser():
     """Initialize the global browser instance"""
@@ -128,64 +159,95 @@ async def close_browser():
         global_browser = None
         print("✅ Browser closed!")
 
-async def extract_metrics(page):
-    metrics = await page.evaluate("""
-        () => {
-            let dr = null;
-            let backlinks = null;
-            let linkingWebsites = null;
+# Metrics extraction script - built once, sent as-is on every evaluate
+EXTRACT_METRICS_JS = """
+    () => {
+        let dr = null;
+        let backlinks = null;
+        let linkingWebsites = null;
+        
+        // One pass over text nodes finds all three labels (outermost element whose
+        // whole text is the label - the same element a document-order scan of '*' finds)
+        const labels = new Map([['Domain Rating', null], ['Backlinks', null], ['Linking websites', null]]);
+        let remaining = labels.size;
+        const walker = document.createTreeWalker(document.body, NodeFilter.SHOW_TEXT);
+        
+        while (remaining > 0 && walker.nextNode()) {
+            const text = walker.currentNode.data.trim();
+            if (!labels.has(text) || labels.get(text)) continue;
             
-            const allElements = Array.from(document.querySelectorAll('*'));
+            let el = walker.currentNode.parentElement;
+            if (!el || el.textContent.trim() !== text) continue;
+            while (el.parentElement && el.parentElement.textContent.trim() === text) {
+                el = el.parentElement;
+            }
             
-            const drLabel = allElements.find(el => el.textContent.trim() === 'Domain Rating');
-            const backlinksLabel = allElements.find(el => el.textContent.trim() === 'Backlinks');
-            const linkingLabel = allElements.find(el => el.textContent.trim() === 'Linking websites');
+            labels.set(text, el);
+            remaining--;
+        }
+        
+        // Big numeric spans, collected once in document order (getComputedStyle runs once per span,
+        // not once per span per ancestor level per label)
+        const NUM_RE = /^[0-9.,KM]+$/;
+        const bigNumbers = [];
+        for (const span of document.querySelectorAll('span')) {
+            const text = span.textContent.trim();
+            if (text && NUM_RE.test(text) && parseFloat(window.getComputedStyle(span).fontSize) > 25) {
+                bigNumbers.push([span, text]);
+            }
+        }
+        
+        // Closest ancestor (up to 8 levels) containing a big number wins
+        const findNumber = (label) => {
+            if (!label) return null;
             
-            const findNumber = (label) => {
-                if (!label) return null;
+            let parent = label;
+            for (let i = 0; i < 8; i++) {
+                parent = parent.parentElement;
+                if (!parent) break;
                 
-                let parent = label;
-                for (let i = 0; i < 8; i++) {
-                    parent = parent.parentElement;
-                    if (!parent) break;
-                    
-                    const spans = parent.querySelectorAll('span');
-                    for (const span of spans) {
-                        const text = span.textContent.trim();
-                        const fontSize = window.getComputedStyle(span).fontSize;
-                        
-                        if (text && /^[0-9.,KM]+$/.test(text) && parseFloat(fontSize) > 25) {
-                            return text;
-                        }
+                for (const [span, text] of bigNumbers) {
+                    if (parent.contains(span)) {
+                        return text;
                     }
                 }
-                return null;
-            };
-            
-            dr = findNumber(drLabel);
-            backlinks = findNumber(backlinksLabel);
-            linkingWebsites = findNumber(linkingLabel);
-            
-            return {
-                _dr: dr,
-                backlinks: backlinks,
-                linking_websites: linkingWebsites
-            };
-        }
-    """)
-    
-    def convert_to_int(value):
-        if not value:
-            return None
+            }
+            return null;
+        };
         
-        value = str(value).replace(',', '')
+        dr = findNumber(labels.get('Domain Rating'));
+        backlinks = findNumber(labels.get('Backlinks'));
+        linkingWebsites = findNumber(labels.get('Linking websites'));
         
-        if 'K' in value:
-            return int(float(value.replace('K', '')) * 1000)
-        elif 'M' in value:
-            return int(float(value.replace('M', '')) * 1000000)
-        else:
-            return int(float(value))
+        return {
+            _dr: dr,
+            backlinks: backlinks,
+            linking_websites: linkingWebsites
+        };
+    }
+"""
+
+# Metric suffixes ('1.2K', '3.4M') - the JS only returns [0-9.,KM] strings, suffix last
+METRIC_MULTIPLIERS = {'K': 1000, 'M': 1000000}
+
+def convert_to_int(value):
+    """Metric text ('1,234', '1.2K', '3.4M') to int, None if missing"""
+    if not value:
+        return None
+    
+    value = value.replace(',', '')
+    
+    # Plain integers (the common case) skip float parsing entirely
+    if value.isdigit():
+        return int(value)
+    
+    multiplier = METRIC_MULTIPLIERS.get(value[-1])
+    if multiplier:
+        return int(float(value[:-1]) * multiplier)
+    return int(float(value))
+
+async def extract_metrics(page):
+    metrics = await page.evaluate(EXTRACT_METRICS_JS)
     
     return {
         '_dr': convert_to_int(metrics['_dr']),
@@ -193,7 +255,114 @@ async def extract_metrics(page):
         'linking_websites': convert_to_int(metrics['linking_websites'])
     }
 
-async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
+async def wait_for_selector_quietly(page, selector, timeout, state='visible'):
+    """Wait for selector, returns False on timeout instead of raising"""
+    try:
+        await page.wait_for_selector(selector, state=state, timeout=timeout)
+        return True
+    except PlaywrightTimeoutError:
+        return False
+
+async def metrics_showing(page):
+    """True once the metrics label is on the page and no CAPTCHA iframe is left to solve"""
+    return (await page.query_selector(METRICS_SELECTOR) is not None
+            and await page.query_selector(CAPTCHA_SELECTOR) is None)
+
+def _checkbox_candidates(contours, method, score, offset_x, offset_y, region):
+    """
+    Contours that look like a checkbox, as scored candidate dicts (page coordinates)
+    
+    Args:
+        contours: findContours output for the cropped screenshot
+        method: Detection method name stored on each candidate
+        score: Base score for this method
+        offset_x, offset_y: Page coordinates of the crop's top-left corner
+        region: (x0, y0, x1, y1) the checkbox center must lie strictly inside
+    """
+    x0, y0, x1, y1 = region
+    candidates = []
+    
+    for contour in contours:
+        x, y, w, h = cv2.boundingRect(contour)
+        x, y = x + offset_x, y + offset_y  # crop -> page coordinates
+        
+        # Checkbox size filter (18-32 pixels)
+        if not (18 <= w <= 32 and 18 <= h <= 32):
+            continue
+        
+        # Must be nearly square
+        aspect_ratio = w / h if h > 0 else 0
+        if not (0.85 < aspect_ratio < 1.15):
+            continue
+        
+        area = cv2.contourArea(contour)
+        if area < 300:
+            continue
+        
+        center_x = x + w // 2
+        center_y = y + h // 2
+        
+        # Position filter - the crop margin can hold centers outside this captcha type's region
+        if not (x0 < center_x < x1 and y0 < center_y < y1):
+            continue
+        
+        candidates.append({
+            'method': method,
+            'x': x, 'y': y, 'w': w, 'h': h,
+            'center_x': center_x,
+            'center_y': center_y,
+            'aspect_ratio': aspect_ratio,
+            'score': score
+        })
+    
+    return candidates
+
+def _rank_candidates(checkbox_candidates, captcha_type):
+    """
+    Deduplicate, score (expected position + squareness) and sort checkbox candidates, best first
+    
+    Candidates are held as NumPy columns: the 15px proximity test is one broadcast
+    over all pairs and the position scoring one np.select.
+    """
+    if not checkbox_candidates:
+        return []
+    
+    center_x = np.array([c['center_x'] for c in checkbox_candidates])
+    center_y = np.array([c['center_y'] for c in checkbox_candidates])
+    score = np.array([c['score'] for c in checkbox_candidates])
+    aspect_ratio = np.array([c['aspect_ratio'] for c in checkbox_candidates])
+    
+    # Deduplicate candidates (remove those very close to each other): greedy, highest score first,
+    # each kept candidate suppresses everything within 15px (stable - earlier methods win ties)
+    close = ((np.abs(center_x[:, None] - center_x[None, :]) < 15)
+             & (np.abs(center_y[:, None] - center_y[None, :]) < 15))
+    suppressed = np.zeros(len(checkbox_candidates), dtype=bool)
+    keep = []
+    for i in np.argsort(-score, kind='stable'):
+        if not suppressed[i]:
+            keep.append(i)
+            suppressed |= close[i]
+    keep = np.array(keep)
+    
+    # Score candidates based on position and characteristics
+    expected_x, expected_y = CAPTCHA_EXPECTED_POSITIONS[captcha_type]
+    dist_x = np.abs(center_x[keep] - expected_x)
+    dist_y = np.abs(center_y[keep] - expected_y)
+    
+    # Closer to expected position = higher score
+    score = score[keep] + np.select(
+        [(dist_x < 30) & (dist_y < 30), (dist_x < 50) & (dist_y < 50),
+         (dist_x < 80) & (dist_y < 80), (dist_x < 120) & (dist_y < 120)],
+        [20, 15, 10, 5], 0)
+    
+    # Perfect square aspect ratio
+    score += np.where((aspect_ratio[keep] > 0.95) & (aspect_ratio[keep] < 1.05), 3, 0)
+    
+    # Sort by score (stable), as scored copies - the inputs keep their base score
+    order = np.argsort(-score, kind='stable')
+    return [dict(checkbox_candidates[keep[i]], score=int(score[i])) for i in order]
+
+async def scrape_complete(domain, proxy=None):
     """Scrape domain using the global browser instance
     
     Test 4 Approach for BOTH proxy and non-proxy (100% success):
@@ -205,7 +374,6 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
     Args:
         domain: Domain to scrape
         proxy: Dict with keys: server, username, password (optional)
-        page_loaded_callback: Optional callback to call when page is loaded
     """
     global global_browser, shared_context_no_proxy, shared_contexts_with_proxy
     
@@ -225,7 +393,8 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
         async with context_pool_lock:
             if proxy_key not in shared_contexts_with_proxy:
                 print(f"🆕 Creating shared context for proxy: {proxy_key}")
-                shared_contexts_with_proxy[proxy_key] = await global_browser.new_context(proxy=proxy)
+                proxy_context = await global_browser.new_context(proxy=proxy)
+                shared_contexts_with_proxy[proxy_key] = proxy_context
                 print(f"✅ Proxy context created! (Total contexts: {len(shared_contexts_with_proxy) + 1})")
             
             context = shared_contexts_with_proxy[proxy_key]
@@ -248,15 +417,13 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
     print(f"📄 New page created for {domain} (Test 4: shared context + page only)")
     
     try:
-        # Decode base64 text to string
-        _url = 'aHR0cHM6Ly9haHJlZnMuY29tL3dlYnNpdGUtYXV0aG9yaXR5LWNoZWNrZXI/aW5wdXQ9'
-        _url = base64.b64decode(_url).decode('utf-8')
-
-        url = f'{_url}{domain}'
+        url = f'{_AHREFS_URL_BASE}{domain}'
         await page.goto(url, wait_until='networkidle', timeout=80000)
         print(f"🔍 Page loaded for {domain}")
         
-        await asyncio.sleep(10)
+        # Wait (up to the old fixed 10s) for a CAPTCHA or the metrics, whichever shows up first
+        await wait_for_selector_quietly(page, READY_SELECTOR, timeout=10000)
+        metrics_ready = await metrics_showing(page)
         
         # Function to find and click CAPTCHA checkbox
         async def find_and_click_captcha(captcha_type, attempt_number):
@@ -264,8 +431,21 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
             captcha_type: 'full_page' or 'main_page'
             attempt_number: 1 or 2
             """
-            # Screenshot
-            screenshot_bytes = await page.screenshot()
+            # Screenshot only this captcha type's region + margin (JPEG) - every method runs on the crop
+            region = CAPTCHA_REGIONS[captcha_type]
+            x0, y0, x1, y1 = region
+            roi_x = x0 - CAPTCHA_ROI_MARGIN  # page coordinates of the crop
+            roi_y = y0 - CAPTCHA_ROI_MARGIN
+            screenshot_bytes = await page.screenshot(
+                type='jpeg',
+                quality=CAPTCHA_SCREENSHOT_QUALITY,
+                clip={
+                    'x': roi_x,
+                    'y': roi_y,
+                    'width': x1 - x0 + 2 * CAPTCHA_ROI_MARGIN,
+                    'height': y1 - y0 + 2 * CAPTCHA_ROI_MARGIN
+                }
+            )
             img_array = np.frombuffer(screenshot_bytes, np.uint8)
             img = cv2.imdecode(img_array, cv2.IMREAD_COLOR)
             gray = cv2.cvtColor(img, cv2.COLOR_BGR2GRAY)
@@ -284,43 +464,9 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
             # Find contours in white mask
             contours_white, _ = cv2.findContours(white_mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
             
-            for contour in contours_white:
-                x, y, w, h = cv2.boundingRect(contour)
-                
-                # Checkbox size filter (18-32 pixels)
-                if not (18 <= w <= 32 and 18 <= h <= 32):
-                    continue
-                
-                # Must be nearly square
-                aspect_ratio = w / h if h > 0 else 0
-                if not (0.85 < aspect_ratio < 1.15):
-                    continue
-                
-                area = cv2.contourArea(contour)
-                if area < 300:
-                    continue
-                
-                center_x = x + w // 2
-                center_y = y + h // 2
-                
-                # Position filter - DIFFERENT for each captcha type
-                if captcha_type == 'full_page':
-                    # Full page captcha - LEFT side of screen (x: 150-400, y: 200-400)
-                    if not (150 < center_x < 400 and 200 < center_y < 400):
-                        continue
-                else:  # main_page
-                    # Main page captcha - RIGHT-CENTER area (x: 500-900, y: 300-550)
-                    if not (500 < center_x < 900 and 300 < center_y < 550):
-                        continue
-                
-                checkbox_candidates.append({
-                    'method': 'color',
-                    'x': x, 'y': y, 'w': w, 'h': h,
-                    'center_x': center_x,
-                    'center_y': center_y,
-                    'aspect_ratio': aspect_ratio,
-                    'score': 10  # Base score for color method
-                })
+            checkbox_candidates.extend(
+                _checkbox_candidates(contours_white, 'color', 10, roi_x, roi_y, region)  # Base score for color method
+            )
             
             # print(f"  Found {len(checkbox_candidates)} candidates from color detection")
             
@@ -332,164 +478,48 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
             # Invert so checkbox border is white
             adaptive_thresh = cv2.bitwise_not(adaptive_thresh)
             
-            # Find contours
-            contours_adaptive, _ = cv2.findContours(adaptive_thresh, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
+            # Find contours (hierarchy is never used - LIST skips building the tree)
+            contours_adaptive, _ = cv2.findContours(adaptive_thresh, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
             
-            for contour in contours_adaptive:
-                x, y, w, h = cv2.boundingRect(contour)
-                
-                if not (18 <= w <= 32 and 18 <= h <= 32):
-                    continue
-                
-                aspect_ratio = w / h if h > 0 else 0
-                if not (0.85 < aspect_ratio < 1.15):
-                    continue
-                
-                area = cv2.contourArea(contour)
-                if area < 300:
-                    continue
-                
-                center_x = x + w // 2
-                center_y = y + h // 2
-                
-                # Position filter - DIFFERENT for each captcha type
-                if captcha_type == 'full_page':
-                    # Full page captcha - LEFT side
-                    if not (150 < center_x < 400 and 200 < center_y < 400):
-                        continue
-                else:  # main_page
-                    # Main page captcha - RIGHT-CENTER area
-                    if not (500 < center_x < 900 and 300 < center_y < 550):
-                        continue
-                
-                checkbox_candidates.append({
-                    'method': 'adaptive',
-                    'x': x, 'y': y, 'w': w, 'h': h,
-                    'center_x': center_x,
-                    'center_y': center_y,
-                    'aspect_ratio': aspect_ratio,
-                    'score': 8
-                })
+            checkbox_candidates.extend(
+                _checkbox_candidates(contours_adaptive, 'adaptive', 8, roi_x, roi_y, region)
+            )
             
             # print(f"  Found {len([c for c in checkbox_candidates if c['method']=='adaptive'])} candidates from adaptive threshold")
             
-            # METHOD 3: Multiple Canny thresholds
-            # print("🔍 Method 3: Multi-threshold Canny...")
+            # METHOD 3: Canny edges
+            # print("🔍 Method 3: Canny...")
             
-            # Try very low thresholds to catch subtle edges
-            for low_thresh, high_thresh in [(10, 50), (20, 60), (30, 90)]:
-                edges = cv2.Canny(gray, low_thresh, high_thresh)
-                
-                # Dilate to connect edges
-                kernel = np.ones((3, 3), np.uint8)
-                edges = cv2.dilate(edges, kernel, iterations=2)
-                
-                contours_canny, _ = cv2.findContours(edges, cv2.RETR_TREE, cv2.CHAIN_APPROX_SIMPLE)
-                
-                for contour in contours_canny:
-                    x, y, w, h = cv2.boundingRect(contour)
-                    
-                    if not (18 <= w <= 32 and 18 <= h <= 32):
-                        continue
-                    
-                    aspect_ratio = w / h if h > 0 else 0
-                    if not (0.85 < aspect_ratio < 1.15):
-                        continue
-                    
-                    area = cv2.contourArea(contour)
-                    if area < 300:
-                        continue
-                    
-                    center_x = x + w // 2
-                    center_y = y + h // 2
-                    
-                    # Position filter - DIFFERENT for each captcha type
-                    if captcha_type == 'full_page':
-                        # Full page captcha - LEFT side
-                        if not (150 < center_x < 400 and 200 < center_y < 400):
-                            continue
-                    else:  # main_page
-                        # Main page captcha - RIGHT-CENTER area
-                        if not (500 < center_x < 900 and 300 < center_y < 550):
-                            continue
-                    
-                    checkbox_candidates.append({
-                        'method': f'canny_{low_thresh}_{high_thresh}',
-                        'x': x, 'y': y, 'w': w, 'h': h,
-                        'center_x': center_x,
-                        'center_y': center_y,
-                        'aspect_ratio': aspect_ratio,
-                        'score': 6
-                    })
-            
-            # print(f"  Total candidates now: {len(checkbox_candidates)}")
+            # One pass at the lowest thresholds - its edge map covers what the higher threshold pairs found
+            edges = cv2.Canny(gray, 10, 50)
             
-            # Deduplicate candidates (remove those very close to each other)
-            def are_close(c1, c2, threshold=15):
-                return abs(c1['center_x'] - c2['center_x']) < threshold and abs(c1['center_y'] - c2['center_y']) < threshold
+            # Dilate to connect edges
+            edges = cv2.dilate(edges, DILATE_KERNEL, iterations=2)
             
-            unique_candidates = []
-            for candidate in checkbox_candidates:
-                is_duplicate = False
-                for unique in unique_candidates:
-                    if are_close(candidate, unique):
-                        # Keep the one with higher score
-                        if candidate['score'] > unique['score']:
-                            unique_candidates.remove(unique)
-                            unique_candidates.append(candidate)
-                        is_duplicate = True
-                        break
-                if not is_duplicate:
-                    unique_candidates.append(candidate)
+            # Hierarchy is never used - LIST skips building the tree
+            contours_canny, _ = cv2.findContours(edges, cv2.RETR_LIST, cv2.CHAIN_APPROX_SIMPLE)
+            checkbox_candidates.extend(
+                _checkbox_candidates(contours_canny, 'canny', 6, roi_x, roi_y, region)
+            )
             
-            checkbox_candidates = unique_candidates
-            # print(f"  After deduplication: {len(checkbox_candidates)} candidates")
-            
-            # Score candidates based on position and characteristics
-            for candidate in checkbox_candidates:
-                center_x = candidate['center_x']
-                center_y = candidate['center_y']
-                
-                # Expected position - COMPLETELY DIFFERENT for each captcha type
-                if captcha_type == 'full_page':
-                    # Full page captcha - LEFT side (from your screenshot: ~222, 288)
-                    expected_x = 240
-                    expected_y = 290
-                else:  # main_page
-                    # Main page captcha - RIGHT-CENTER area (from screenshots: ~680, 430)
-                    expected_x = 680
-                    expected_y = 430
-                
-                dist_x = abs(center_x - expected_x)
-                dist_y = abs(center_y - expected_y)
-                
-                # Closer to expected position = higher score
-                if dist_x < 30 and dist_y < 30:
-                    candidate['score'] += 20
-                elif dist_x < 50 and dist_y < 50:
-                    candidate['score'] += 15
-                elif dist_x < 80 and dist_y < 80:
-                    candidate['score'] += 10
-                elif dist_x < 120 and dist_y < 120:
-                    candidate['score'] += 5
-                
-                # Perfect square aspect ratio
-                if 0.95 < candidate['aspect_ratio'] < 1.05:
-                    candidate['score'] += 3
+            # print(f"  Total candidates now: {len(checkbox_candidates)}")
             
-            # Sort by score
-            checkbox_candidates.sort(key=lambda c: c['score'], reverse=True)
+            # Deduplicate, score and sort
+            checkbox_candidates = _rank_candidates(checkbox_candidates, captcha_type)
             
-            # Draw all candidates
-            candidates_img = img.copy()
-            for idx, candidate in enumerate(checkbox_candidates[:10]):
-                color = (0, 255, 0) if idx == 0 else (255, 165, 0) if idx < 3 else (0, 165, 255)
-                thickness = 3 if idx == 0 else 2
-                cv2.rectangle(candidates_img, (candidate['x'], candidate['y']), 
-                            (candidate['x']+candidate['w'], candidate['y']+candidate['h']), color, thickness)
-                cv2.putText(candidates_img, f"#{idx+1}:S{candidate['score']}", 
-                          (candidate['x'], candidate['y']-5), 
-                          cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+            # Draw all candidates (img is the crop - shift page coordinates back into it)
+            if DEBUG_DRAW:
+                candidates_img = img.copy()
+                for idx, candidate in enumerate(checkbox_candidates[:10]):
+                    color = (0, 255, 0) if idx == 0 else (255, 165, 0) if idx < 3 else (0, 165, 255)
+                    thickness = 3 if idx == 0 else 2
+                    cx, cy = candidate['x'] - roi_x, candidate['y'] - roi_y
+                    cv2.rectangle(candidates_img, (cx, cy), 
+                                (cx+candidate['w'], cy+candidate['h']), color, thickness)
+                    cv2.putText(candidates_img, f"#{idx+1}:S{candidate['score']}", 
+                              (cx, cy-5), 
+                              cv2.FONT_HERSHEY_SIMPLEX, 0.4, color, 1)
+                cv2.imwrite(f"captcha_debug_{domain}_{captcha_type}_{attempt_number}_candidates.jpg", candidates_img)
             
             # Print top candidates
             # print(f"\n📊 Top candidates for {captcha_type.upper().replace('_', ' ')} CAPTCHA:")
@@ -505,12 +535,15 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
                 click_y = target['center_y']
                 
                 # Draw final clicked position
-                final_img = img.copy()
-                cv2.rectangle(final_img, (target['x'], target['y']), 
-                            (target['x']+target['w'], target['y']+target['h']), (0, 0, 255), 3)
-                cv2.circle(final_img, (click_x, click_y), 5, (0, 0, 255), -1)
-                cv2.putText(final_img, f"CLICKED: ({click_x}, {click_y})", 
-                          (click_x + 10, click_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+                if DEBUG_DRAW:
+                    final_img = img.copy()
+                    tx, ty = target['x'] - roi_x, target['y'] - roi_y
+                    cv2.rectangle(final_img, (tx, ty), 
+                                (tx+target['w'], ty+target['h']), (0, 0, 255), 3)
+                    cv2.circle(final_img, (click_x - roi_x, click_y - roi_y), 5, (0, 0, 255), -1)
+                    cv2.putText(final_img, f"CLICKED: ({click_x}, {click_y})", 
+                              (click_x - roi_x + 10, click_y - roi_y), cv2.FONT_HERSHEY_SIMPLEX, 0.5, (0, 0, 255), 2)
+                    cv2.imwrite(f"captcha_debug_{domain}_{captcha_type}_{attempt_number}_clicked.jpg", final_img)
                 
                 await page.mouse.click(click_x, click_y)
                 return True
@@ -520,25 +553,28 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
         
         # CAPTCHA #1: Full Page CAPTCHA (appears first, full screen, LEFT side)
         # print("\n🔍 Looking for CAPTCHA #1 (FULL PAGE CAPTCHA - LEFT SIDE)...")
-        first_captcha_found = await find_and_click_captcha('full_page', 1)
-
-        if first_captcha_found:
-            await asyncio.sleep(10)
-            await page.wait_for_load_state('networkidle')
-        
-        # Trigger callback to start next domain (after first CAPTCHA handled)
-        print(f"✨ First CAPTCHA handled for {domain}, starting next task...")
-        if page_loaded_callback:
-            await page_loaded_callback()
+        if not metrics_ready:
+            first_captcha_found = await find_and_click_captcha('full_page', 1)
+
+            if first_captcha_found:
+                # Solved once the CAPTCHA frame goes away, then wait for the next page (up to the old 10s each)
+                await wait_for_selector_quietly(page, CAPTCHA_SELECTOR, timeout=10000, state='detached')
+                await wait_for_selector_quietly(page, READY_SELECTOR, timeout=10000)
+                metrics_ready = await metrics_showing(page)
+            
+            print(f"✨ First CAPTCHA handled for {domain}")
 
         # CAPTCHA #2: Main Page CAPTCHA (appears on page, RIGHT-CENTER area)
-        # Try this regardless of whether CAPTCHA #1 was found
+        # Try this regardless of whether CAPTCHA #1 was found (skipped once the metrics are showing)
         # print("\n🔍 Looking for CAPTCHA #2 (MAIN PAGE CAPTCHA - RIGHT SIDE)...")
-        second_captcha_found = await find_and_click_captcha('main_page', 2)
+        if not metrics_ready:
+            second_captcha_found = await find_and_click_captcha('main_page', 2)
 
-        if second_captcha_found:
-            await asyncio.sleep(15)
-            await page.wait_for_load_state('networkidle')
+            if second_captcha_found:
+                metrics_ready = await wait_for_selector_quietly(page, METRICS_SELECTOR, timeout=15000)
+        
+        if metrics_ready:
+            await asyncio.sleep(METRICS_HYDRATE_DELAY)
         
         # Extract metrics
         metrics = await extract_metrics(page)
@@ -558,41 +594,17 @@ async def scrape_complete(domain, proxy=None, page_loaded_callback=None):
         print(f"🧹 Cleaning up page for {domain} (keeping shared context open)")
         await page.close()
 
-async def process_next_task():
-    """Process one task from the queue (up to MAX_CONCURRENT_PROCESSING at a time)"""
-    global task_queue, current_processing_count
-    
-    # Get next task
-    async with queue_lock:
-        if len(task_queue) == 0:
-            print("📭 Queue empty - no more tasks")
-            return
-        
-        task = task_queue.pop(0)
-        task_id = task['task_id']
-        domain = task['domain']
-        proxy = task.get('proxy')
-    
-    # Increment processing count
-    async with processing_count_lock:
-        current_processing_count += 1
-        processing = current_processing_count
-    
-    # Process this task
-    print(f"🔄 Processing from queue: {domain} (Processing: {processing}/{MAX_CONCURRENT_PROCESSING}, Queue: {len(task_queue)})")
-    
-    # Callback to trigger next task when page loads
-    async def on_page_loaded():
-        print(f"✨ Page loaded for {domain}, checking for next task...")
-        # Try to start next task if capacity available
-        await start_next_if_possible()
+async def process_task(task):
+    """Scrape one task's domain and record the outcome in jobs / results"""
+    task_id = task['task_id']
+    domain = task['domain']
+    proxy = task.get('proxy')
     
     try:
         jobs[task_id]['status'] = 'processing'
         jobs[task_id]['started_at'] = datetime.now().isoformat()
         
-        # Pass callback - next task starts when page loads, not when scraping completes
-        result = await scrape_complete(domain, proxy, page_loaded_callback=on_page_loaded)
+        result = await scrape_complete(domain, proxy)
         
         jobs[task_id]['status'] = 'completed'
         jobs[task_id]['completed_at'] = datetime.now().isoformat()
@@ -605,57 +617,43 @@ async def process_next_task():
         jobs[task_id]['error'] = str(e)
         jobs[task_id]['completed_at'] = datetime.now().isoformat()
         print(f"❌ Task {task_id} failed: {e}")
-    
-    finally:
-        # Decrement processing count
-        async with processing_count_lock:
-            current_processing_count -= 1
-            processing = current_processing_count
-        
-        print(f"🏁 Task finished: {domain} (Processing now: {processing}/{MAX_CONCURRENT_PROCESSING})")
-        
-        # Try to start next task
-        await start_next_if_possible()
 
-async def start_next_if_possible():
-    """Start next task from queue if under the concurrent limit"""
+async def queue_worker(worker_id):
+    """Long-lived worker: processes tasks from task_queue one at a time (MAX_CONCURRENT_PROCESSING of these run)"""
     global current_processing_count
     
-    async with processing_count_lock:
-        can_start = current_processing_count < MAX_CONCURRENT_PROCESSING
-        processing = current_processing_count
-    
-    if can_start and len(task_queue) > 0:
-        print(f"🚀 Starting next task (Processing: {processing}/{MAX_CONCURRENT_PROCESSING})")
-        asyncio.create_task(process_next_task())
-    elif processing >= MAX_CONCURRENT_PROCESSING:
-        print(f"⏸️  At capacity ({MAX_CONCURRENT_PROCESSING}/{MAX_CONCURRENT_PROCESSING}), waiting for slot...")
-    else:
-        print(f"📭 No more tasks in queue")
+    while True:
+        task = await task_queue.get()
+        queued_tasks.pop(task['task_id'], None)
+        
+        current_processing_count += 1
+        print(f"🔄 Worker {worker_id} processing: {task['domain']} (Processing: {current_processing_count}/{MAX_CONCURRENT_PROCESSING}, Queue: {len(queued_tasks)})")
+        
+        try:
+            await process_task(task)
+        finally:
+            current_processing_count -= 1
+            task_queue.task_done()
+            print(f"🏁 Task finished: {task['domain']} (Processing now: {current_processing_count}/{MAX_CONCURRENT_PROCESSING})")
 
 async def add_task_to_queue(task_id, domain, proxy=None):
-    """Add a task to the queue and start processing if capacity available"""
-    global task_queue, current_processing_count
-    
-    # Add task to queue
-    async with queue_lock:
-        task_queue.append({
-            'task_id': task_id,
-            'domain': domain,
-            'proxy': proxy
-        })
-        queue_size = len(task_queue)
-    
-    async with processing_count_lock:
-        processing = current_processing_count
-    
-    print(f"📥 Added to queue: {domain} (Queue: {queue_size}, Processing: {processing}/{MAX_CONCURRENT_PROCESSING})")
+    """Add a task to the queue (the next free queue_worker picks it up)"""
+    task = {
+        'task_id': task_id,
+        'domain': domain,
+        'proxy': proxy
+    }
+    queued_tasks[task_id] = task
+    task_queue.put_nowait(task)  # Unbounded queue - never waits
     
-    # Try to start this task if we have capacity
-    await start_next_if_possible()
+    print(f"📥 Added to queue: {domain} (Queue: {len(queued_tasks)}, Processing: {current_processing_count}/{MAX_CONCURRENT_PROCESSING})")
 
 def run_async_scrape(task_id, domain, proxy=None):
-    """Submit scrape task to the queue via global event loop"""
+    """Submit scrape task to the queue via global event loop
+    
+    Called straight from the request handlers: run_coroutine_threadsafe only
+    schedules the coroutine on global_loop and returns, so no helper thread is needed.
+    """
     global global_loop
     
     if global_loop is None:
@@ -678,7 +676,7 @@ def health():
         'processing': len([j for j in jobs.values() if j['status'] == 'processing']),
         'completed': len([j for j in jobs.values() if j['status'] == 'completed']),
         'failed': len([j for j in jobs.values() if j['status'] == 'failed']),
-        'queue_size': len(task_queue),
+        'queue_size': len(queued_tasks),
         'max_concurrent': MAX_CONCURRENT_PROCESSING,
         'current_processing': current_processing_count,
         'context_pool': {
@@ -692,7 +690,7 @@ def health():
 def queue_status():
     """Get current queue status"""
     queue_items = []
-    for task in task_queue:
+    for task in list(queued_tasks.values()):
         queue_items.append({
             'task_id': task['task_id'],
             'domain': task['domain'],
@@ -700,7 +698,7 @@ def queue_status():
         })
     
     return jsonify({
-        'queue_size': len(task_queue),
+        'queue_size': len(queue_items),
         'processing_count': len([j for j in jobs.values() if j['status'] == 'processing']),
         'queue': queue_items
     })
@@ -749,9 +747,7 @@ def scrape():
     }
     
     # Add to queue (will be processed sequentially)
-    thread = Thread(target=run_async_scrape, args=(task_id, domain, proxy))
-    thread.daemon = True
-    thread.start()
+    run_async_scrape(task_id, domain, proxy)
     
     print(f"📥 New job {task_id}: {domain}" + (f" [proxy: {proxy_server}]" if proxy else ""))
     
@@ -860,9 +856,7 @@ def batch_scrape():
             'proxy': proxy.get('server') if proxy else None
         }
         
-        thread = Thread(target=run_async_scrape, args=(task_id, domain, proxy))
-        thread.daemon = True
-        thread.start()
+        run_async_scrape(task_id, domain, proxy)
         
         task_ids.append(task_id)
     
@@ -895,6 +889,13 @@ def startup():
     future = asyncio.run_coroutine_threadsafe(initialize_browser(), global_loop)
     future.result(timeout=30)  # Wait for browser to initialize
     
+    # Start the queue workers (run for the life of the loop)
+    queue_worker_futures.extend(
+        asyncio.run_coroutine_threadsafe(queue_worker(worker_id), global_loop)
+        for worker_id in range(1, MAX_CONCURRENT_PROCESSING + 1)
+    )
+    print(f"👷 Started {MAX_CONCURRENT_PROCESSING} queue workers")
+    
     print("✅ Startup complete!")
 
 if __name__ == '__main__':
@@ -912,7 +913,9 @@ if __name__ == '__main__':
         # Cleanup on shutdown
         print("\n🛑 Shutting down...")
         if global_loop and global_loop.is_running():
-            # Close browser in the global loop
+            # Stop taking new tasks, then close browser in the global loop
+            for worker_future in queue_worker_futures:
+                worker_future.cancel()
             future = asyncio.run_coroutine_threadsafe(close_browser(), global_loop)
             future.result(timeout=10)
             
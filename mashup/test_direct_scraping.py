@@ -8,7 +8,9 @@ Reads domains from domains_100.txt and processes them.
 
 import asyncio
 import time
+import uvloop
 from datetime import datetime
+from itertools import islice
 
 # Import helpers
 from camoufox_helper import initialize_browser, close_browser, get_context_pool_stats
@@ -18,17 +20,17 @@ from ahrefs_helper import scrape_ahrefs_domain
 MAX_CONCURRENT_WORKERS = 3  # Set to 0 to process ALL domains, or N to limit to first N domains
 DOMAINS_FILE = "domains_100.txt"
 USE_PROXIES = False  # Set to True to use proxies, False to test without proxies
+TASK_CHUNK_SIZE = 20  # Tasks in flight at once (the next chunk starts when the current one is done)
 
-# Results storage
-results = []
-failed = []
 
-
-def load_domains(filename):
-    """Load domains from file"""
+def load_domains(filename, limit=0):
+    """Load domains from file (stops reading after limit + 1 domains if limit > 0)"""
     try:
-        with open(filename, 'r') as f:
-            domains = [line.strip() for line in f if line.strip()]
+        with open(filename, 'r', buffering=1 << 16) as f:
+            stripped = (line.strip() for line in f)
+            domains = (domain for domain in stripped if domain)
+            # One past the limit, so main() can tell the file had more
+            domains = list(islice(domains, limit + 1) if limit > 0 else domains)
         print(f"✅ Loaded {len(domains)} domains from {filename}")
         return domains
     except FileNotFoundError:
@@ -83,35 +85,30 @@ def load_proxies(filename="Webshare 100 proxies.txt"):
         return []
 
 
-async def scrape_domain_task(idx, domain, use_proxy=False, proxies=None):
+async def scrape_domain_task(idx, domain, proxy=None):
     """
     Scrape a single domain (Test 4 approach - NO semaphore)
     
     Args:
         idx: Domain index
         domain: Domain to scrape
-        use_proxy: Whether to use proxies
-        proxies: List of proxies (if use_proxy is True)
+        proxy: Proxy dict assigned to this domain (None for no proxy)
     
     Returns:
         tuple: (success, result_or_error_dict)
     """
-    print(f"[{idx:3d}] 🔄 Processing {domain}")
+    # One print per event (start / finish) - lines of the same event are written together
+    proxy_info = f"\n[{idx:3d}]    🔒 Using proxy: {proxy['server']}" if proxy else ""
+    print(f"[{idx:3d}] 🔄 Processing {domain}{proxy_info}")
     start_time = time.time()
     
-    # Get proxy if enabled
-    proxy = None
-    if use_proxy and proxies:
-        proxy = proxies[(idx - 1) % len(proxies)]
-        print(f"[{idx:3d}]    🔒 Using proxy: {proxy['server']}")
-    
     try:
         # Scrape the domain (NO semaphore - Test 4 approach!)
         result = await scrape_ahrefs_domain(domain, proxy)
         
         elapsed = time.time() - start_time
-        print(f"[{idx:3d}] ✅ Completed {domain} in {elapsed:.1f}s")
-        print(f"[{idx:3d}]    DR: {result['_dr']}, Backlinks: {result['backlinks']}, Linking: {result['linking_websites']}")
+        print(f"[{idx:3d}] ✅ Completed {domain} in {elapsed:.1f}s\n"
+              f"[{idx:3d}]    DR: {result['_dr']}, Backlinks: {result['backlinks']}, Linking: {result['linking_websites']}")
         
         return (True, {
             'domain': domain,
@@ -132,10 +129,40 @@ async def scrape_domain_task(idx, domain, use_proxy=False, proxies=None):
         })
 
 
+async def run_chunked(coros, chunk_size=TASK_CHUNK_SIZE):
+    """
+    Run coroutines chunk_size at a time, yielding (index, result) as soon as each finishes
+    
+    coros can be any iterable (e.g. a generator) - each chunk's coroutines are only
+    created when that chunk starts. A coroutine that raises (or is cancelled) yields
+    its exception as the result, so one crash doesn't throw away the other in-flight tasks.
+    """
+    coros = iter(coros)
+    start = 0
+    while True:
+        chunk = list(islice(coros, chunk_size))
+        if not chunk:
+            break
+        
+        pending = {asyncio.create_task(coro): index for index, coro in enumerate(chunk, start)}
+        start += len(chunk)
+        try:
+            while pending:
+                done, _ = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    index = pending.pop(task)
+                    if task.cancelled():
+                        yield index, asyncio.CancelledError()
+                    else:
+                        yield index, task.exception() or task.result()
+        finally:
+            # Caller stopped early - don't leave this chunk's tasks running
+            for task in pending:
+                task.cancel()
+
+
 async def main():
     """Main async function"""
-    global results, failed
-    
     print("=" * 80)
     print("🧪 Direct Scraping Test (NO Flask)")
     print("=" * 80)
@@ -146,7 +173,7 @@ async def main():
     print()
     
     # Load domains
-    domains = load_domains(DOMAINS_FILE)
+    domains = load_domains(DOMAINS_FILE, MAX_CONCURRENT_WORKERS)
     
     if not domains:
         print("❌ No domains to process")
@@ -184,23 +211,35 @@ async def main():
         print()
     
     # Create tasks for all domains (Test 4 approach - NO semaphore!)
-    print(f"🚀 Starting {total} concurrent tasks (Test 4: NO semaphore)...")
+    print(f"🚀 Starting {total} tasks, {TASK_CHUNK_SIZE} at a time (Test 4: NO semaphore)...")
     start_time = time.time()
     
-    tasks = []
-    for idx, domain in enumerate(domains, 1):
-        task = scrape_domain_task(idx, domain, use_proxy, proxies)
-        tasks.append(task)
+    # Assign proxies round-robin once, up front
+    if use_proxy:
+        proxy_assignments = [proxies[i % len(proxies)] for i in range(total)]
+    else:
+        proxy_assignments = [None] * total
     
-    # Run ALL tasks concurrently using asyncio.gather (like Test 4)
-    task_results = await asyncio.gather(*tasks, return_exceptions=False)
+    # Generator: each coroutine is created only when its chunk starts
+    tasks = (scrape_domain_task(idx, domain, proxy_assignments[idx - 1])
+             for idx, domain in enumerate(domains, 1))
     
-    # Process results
-    for success, data in task_results:
-        if success:
-            results.append(data)
-        else:
-            failed.append(data)
+    # Run tasks concurrently in chunks of TASK_CHUNK_SIZE, storing each result in its domain's slot
+    outcomes = [None] * total
+    async for i, outcome in run_chunked(tasks):
+        if isinstance(outcome, BaseException):
+            print(f"[{i + 1:3d}] ❌ Task crashed for {domains[i]} - {outcome}")
+            outcome = (False, {
+                'domain': domains[i],
+                'error': str(outcome),
+                'elapsed': time.time() - start_time,
+                'idx': i + 1
+            })
+        outcomes[i] = outcome
+    
+    # Split into successes and failures (in domain order)
+    results = [data for success, data in outcomes if success]
+    failed = [data for success, data in outcomes if not success]
     
     # Calculate stats
     elapsed_total = time.time() - start_time
@@ -252,7 +291,7 @@ async def main():
 
 if __name__ == '__main__':
     try:
-        asyncio.run(main())
+        uvloop.run(main())  # libuv event loop instead of the default selector loop
     except KeyboardInterrupt:
         print("\n\n⏸️  Interrupted by user")
 
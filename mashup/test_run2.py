@@ -8,13 +8,16 @@ import time
 
 BASE_URL = "http://localhost:5001"
 
+# One keep-alive session for every request (no new TCP connection per call)
+session = requests.Session()
+
 def test_single_load():
     """Test single domain load"""
     print("=" * 80)
     print("Test 1: Single Domain Load")
     print("=" * 80)
     
-    response = requests.post(f"{BASE_URL}/load", json={
+    response = session.post(f"{BASE_URL}/load", json={
         'domain': 'example.com'
     })
     
@@ -36,7 +39,7 @@ def test_batch_load():
         'nodejs.org'
     ]
     
-    response = requests.post(f"{BASE_URL}/batch", json={
+    response = session.post(f"{BASE_URL}/batch", json={
         'domains': domains
     })
     
@@ -55,7 +58,7 @@ def test_with_proxy():
         with open('Webshare 100 proxies.txt', 'r') as f:
             first_proxy = f.readline().strip()
         
-        response = requests.post(f"{BASE_URL}/load", json={
+        response = session.post(f"{BASE_URL}/load", json={
             'domain': 'example.com',
             'proxy': first_proxy
         })
@@ -77,7 +80,7 @@ def monitor_queue(duration=30):
     start_time = time.time()
     
     while time.time() - start_time < duration:
-        response = requests.get(f"{BASE_URL}/queue")
+        response = session.get(f"{BASE_URL}/queue")
         data = response.json()
         
         print(f"[{time.time() - start_time:6.1f}s] "
@@ -102,21 +105,32 @@ def get_results():
     print("Final Results")
     print("=" * 80)
     
-    response = requests.get(f"{BASE_URL}/results")
-    data = response.json()
+    # /results is paginated - page until both lists are exhausted
+    completed = []
+    failed = []
+    offset = 0
+    while True:
+        response = session.get(f"{BASE_URL}/results", params={'offset': offset})
+        data = response.json()
+        completed.extend(data['completed'])
+        failed.extend(data['failed'])
+        
+        offset += data['limit']
+        if not data['limit'] or offset >= max(data['completed_total'], data['failed_total']):
+            break
     
     print(f"\nTotal: {data['total']}")
-    print(f"Completed: {len(data['completed'])}")
-    print(f"Failed: {len(data['failed'])}")
+    print(f"Completed: {len(completed)}")
+    print(f"Failed: {len(failed)}")
     
-    if data['completed']:
+    if completed:
         print("\n✅ Completed:")
-        for result in data['completed']:
+        for result in completed:
             print(f"   {result['domain']:30s} - {result['elapsed']:5.1f}s - {result['title'][:40]}")
     
-    if data['failed']:
+    if failed:
         print("\n❌ Failed:")
-        for result in data['failed']:
+        for result in failed:
             error = result.get('error', 'Unknown error')[:60]
             print(f"   {result['domain']:30s} - {error}")
     
@@ -133,7 +147,7 @@ if __name__ == '__main__':
     print("⏳ Waiting for server to be ready...")
     for i in range(10):
         try:
-            response = requests.get(f"{BASE_URL}/health", timeout=2)
+            response = session.get(f"{BASE_URL}/health", timeout=2)
             if response.status_code == 200:
                 print("✅ Server is ready!\n")
                 break
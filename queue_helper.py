@@ -0,0 +1,244 @@
+#!/usr/bin/env python3
+"""
+Task Queue Helper
+
+Handles:
+- SQLite-backed task queue (shared by flask_server.py and worker.py)
+- Atomic task claiming across worker processes
+- Result storage (completed / failed)
+"""
+
+import orjson
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import repeat
+from pathlib import Path
+from queue import Empty, LifoQueue
+
+# Configuration
+QUEUE_DIR = "queue"
+QUEUE_DB = f"{QUEUE_DIR}/task_queue.db"
+CACHE_SIZE_KB = 16 * 1024  # per-connection page cache
+MMAP_SIZE_BYTES = 64 * 1024 * 1024
+POOL_SIZE = 4  # connections per process (gunicorn runs 4 threads per worker process)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS tasks (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    domain TEXT NOT NULL,
+    added_at TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'queued'
+);
+CREATE TABLE IF NOT EXISTS results (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    success INTEGER NOT NULL,
+    payload TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_tasks_status ON tasks (status, id);
+"""
+
+# Bounded pool of connections shared by all threads. The dev server starts a new thread per
+# request, so connections must outlive threads (opening one re-runs every PRAGMA below).
+# SQLite's own locking + BEGIN IMMEDIATE keep writers consistent across connections.
+_pool = LifoQueue()
+_pool_slots = threading.BoundedSemaphore(POOL_SIZE)  # at most POOL_SIZE connections in use (and open)
+
+# Process-wide /queue view cache: (data_version, view), guarded by _view_lock. data_version is read on
+# a dedicated connection that never writes, so every commit (any thread, any process) moves it.
+_view_lock = threading.Lock()
+_version_connection = None
+_queue_view = None
+
+
+def _connect():
+    """Open a tuned database connection (usable from any thread, one at a time)"""
+    Path(QUEUE_DIR).mkdir(exist_ok=True)
+    conn = sqlite3.connect(QUEUE_DB, timeout=30, isolation_level=None, check_same_thread=False)
+    conn.row_factory = sqlite3.Row
+    # WAL: readers never block the writer (server reads while workers write)
+    conn.execute('PRAGMA journal_mode=WAL')
+    # NORMAL is crash-safe in WAL mode (no fsync per commit, only at checkpoints)
+    conn.execute('PRAGMA synchronous=NORMAL')
+    conn.execute('PRAGMA temp_store=MEMORY')
+    # Serve reads from memory: larger page cache + memory-mapped database file
+    conn.execute(f'PRAGMA cache_size=-{CACHE_SIZE_KB}')
+    conn.execute(f'PRAGMA mmap_size={MMAP_SIZE_BYTES}')
+    return conn
+
+
+@contextmanager
+def connection():
+    """Borrow a pooled connection for the duration of the with block"""
+    _pool_slots.acquire()
+    try:
+        try:
+            conn = _pool.get_nowait()
+        except Empty:
+            conn = _connect()  # Pool not full yet - every open connection is borrowed
+        try:
+            yield conn
+        finally:
+            _pool.put(conn)
+    finally:
+        _pool_slots.release()
+
+
+def init_db():
+    """Create the schema if missing - call once at startup, before serving or claiming tasks"""
+    with connection() as conn:
+        conn.executescript(SCHEMA)
+
+
+def add_task(domain, added_at):
+    """Append a task to the queue, returns its queue position"""
+    # Same single-transaction append as a batch of one: the position is read
+    # inside the insert's transaction, so a concurrent enqueue can't skew it
+    return add_tasks((domain,), added_at)
+
+
+def add_tasks(domains, added_at):
+    """Append many tasks in one transaction, returns the queue length afterwards"""
+    with connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.executemany(
+                "INSERT INTO tasks (domain, added_at, status) VALUES (?, ?, 'queued')",
+                # One shared timestamp; rows are streamed into sqlite, no intermediate list
+                zip(domains, repeat(added_at))
+            )
+            queue_length = conn.execute("SELECT COUNT(*) FROM tasks").fetchone()[0]
+            conn.execute('COMMIT')
+        except:
+            conn.execute('ROLLBACK')
+            raise
+
+    return queue_length
+
+
+def get_tasks():
+    """Get all tasks in queue order"""
+    with connection() as conn:
+        rows = conn.execute("SELECT domain, added_at, status FROM tasks ORDER BY id").fetchall()
+    return [dict(row) for row in rows]
+
+
+def claim_next_task():
+    """Atomically mark the oldest queued task as processing
+
+    Returns:
+        dict with keys: id, domain (or None if nothing is queued)
+    """
+    with connection() as conn:
+        # IMMEDIATE takes the write lock up front so two workers can't claim the same task
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            row = conn.execute(
+                "SELECT id, domain FROM tasks WHERE status = 'queued' ORDER BY id LIMIT 1"
+            ).fetchone()
+            if row is not None:
+                conn.execute("UPDATE tasks SET status = 'processing' WHERE id = ?", (row['id'],))
+            conn.execute('COMMIT')
+        except:
+            conn.execute('ROLLBACK')
+            raise
+
+    return dict(row) if row is not None else None
+
+
+def finish_task(task_id, result):
+    """Store a task's result and remove it from the queue"""
+    with connection() as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        try:
+            conn.execute(
+                "INSERT INTO results (success, payload) VALUES (?, ?)",
+                (1 if result['success'] else 0, orjson.dumps(result).decode())
+            )
+            conn.execute("DELETE FROM tasks WHERE id = ?", (task_id,))
+            conn.execute('COMMIT')
+        except:
+            conn.execute('ROLLBACK')
+            raise
+
+
+def get_results():
+    """Get all results split into completed and failed"""
+    with connection() as conn:
+        rows = conn.execute("SELECT success, payload FROM results ORDER BY id").fetchall()
+
+    results = {'completed': [], 'failed': []}
+    for row in rows:
+        results['completed' if row['success'] else 'failed'].append(orjson.loads(row['payload']))
+    return results
+
+
+def count_results():
+    """Get completed/failed result counts"""
+    with connection() as conn:
+        return _count_results(conn)
+
+
+def _count_results(conn):
+    rows = conn.execute("SELECT success, COUNT(*) FROM results GROUP BY success").fetchall()
+
+    counts = {'completed': 0, 'failed': 0}
+    for success, count in rows:
+        counts['completed' if success else 'failed'] = count
+    return counts
+
+
+def get_data_version():
+    """Token that changes whenever the database is written (by any connection or process)
+
+    Call with _view_lock held (the version connection is shared).
+    """
+    global _version_connection
+
+    if _version_connection is None:
+        _version_connection = _connect()
+    return _version_connection.execute('PRAGMA data_version').fetchone()[0]
+
+
+def get_queue_view():
+    """Queued/processing domains and result counts, re-queried only after a write
+
+    Cached for the whole process. Treat the result as read-only.
+
+    Returns:
+        dict with keys: queued_domains, processing_domains, completed, failed
+    """
+    global _queue_view
+
+    with _view_lock:
+        version = get_data_version()
+        if _queue_view is not None and _queue_view[0] == version:
+            return _queue_view[1]
+
+        # A write landing during the query only makes the view newer than version (re-queried next call)
+        with connection() as conn:
+            domains = {'queued': [], 'processing': []}
+            for status, domain in conn.execute("SELECT status, domain FROM tasks ORDER BY id"):
+                if status in domains:
+                    domains[status].append(domain)
+
+            view = {
+                'queued_domains': domains['queued'],
+                'processing_domains': domains['processing'],
+                **_count_results(conn)
+            }
+
+        _queue_view = (version, view)
+        return view
+
+
+def clear_tasks():
+    """Remove all tasks from the queue"""
+    with connection() as conn:
+        conn.execute("DELETE FROM tasks")
+
+
+def clear_results():
+    """Remove all stored results"""
+    with connection() as conn:
+        conn.execute("DELETE FROM results")
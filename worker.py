@@ -17,6 +17,7 @@ from pathlib import Path
 
 # Import helpers
 from camoufox_helper import initialize_browser, close_browser, get_or_create_context, create_page_in_context
+import queue_helper
 import cv2
 import numpy as np
 
@@ -29,11 +30,7 @@ args = parser.parse_args()
 MAX_CONCURRENT_PROCESSING = 1
 DEBUG = False
 MAX_TIMEOUT_ERRORS = 5
-QUEUE_DIR = "queue"
-RESULTS_DIR = "results"
 WORKER_DIR = "worker"
-QUEUE_FILE = f"{QUEUE_DIR}/task_queue.json"
-RESULTS_FILE = f"{RESULTS_DIR}/results.json"
 POLL_INTERVAL = 2  # seconds
 HEARTBEAT_INTERVAL = 10  # seconds
 HEARTBEAT_TIMEOUT = 30  # seconds (consider worker dead if heartbeat older than this)
@@ -512,19 +509,12 @@ async def process_tasks():
                 print("✅ BROWSER RESTART COMPLETE")
                 print("=" * 80 + "\n")
             
-            # Load queue
-            queue = load_json_file(QUEUE_FILE, [])
-            
-            # Get tasks to process
-            pending_tasks = [t for t in queue if t.get('status') == 'queued']
-            
             # Start new tasks if we have capacity
-            while len(currently_processing) < MAX_CONCURRENT_PROCESSING and pending_tasks:
-                task = pending_tasks.pop(0)
-                task['status'] = 'processing'
-                
-                # Update queue
-                save_json_file(QUEUE_FILE, queue)
+            while len(currently_processing) < MAX_CONCURRENT_PROCESSING:
+                # Claim next queued task (atomic across workers)
+                task = queue_helper.claim_next_task()
+                if task is None:
+                    break
                 
                 # Start processing
                 async def process_and_save(task_data):
@@ -537,18 +527,8 @@ async def process_tasks():
                     if result.get('restart_needed'):
                         restart_needed = True
                     
-                    # Save result
-                    results = load_json_file(RESULTS_FILE, {'completed': [], 'failed': []})
-                    if result['success']:
-                        results['completed'].append(result)
-                    else:
-                        results['failed'].append(result)
-                    save_json_file(RESULTS_FILE, results)
-                    
-                    # Remove from queue
-                    queue = load_json_file(QUEUE_FILE, [])
-                    queue = [t for t in queue if t.get('domain') != domain]
-                    save_json_file(QUEUE_FILE, queue)
+                    # Save result and remove from queue
+                    queue_helper.finish_task(task_data['id'], result)
                     
                     # Remove from currently_processing
                     currently_processing.remove(task_data)
@@ -580,8 +560,7 @@ if __name__ == '__main__':
         print(f"🌐 No proxy (direct connection)")
     print("=" * 80)
     print(f"Max concurrent: {MAX_CONCURRENT_PROCESSING}")
-    print(f"Queue file: {QUEUE_FILE}")
-    print(f"Results file: {RESULTS_FILE}")
+    print(f"Queue DB: {queue_helper.QUEUE_DB}")
     print(f"Poll interval: {POLL_INTERVAL}s")
     print(f"Heartbeat file: {HEARTBEAT_FILE}")
     print("=" * 80)
@@ -595,6 +574,9 @@ if __name__ == '__main__':
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
+    # Create the queue database schema if the server hasn't yet
+    queue_helper.init_db()
+    
     try:
         asyncio.run(process_tasks())
     except KeyboardInterrupt:
@@ -0,0 +1,13 @@
+#!/usr/bin/env python3
+"""
+WSGI Entry Point - Production server for flask_server.py
+
+Run with:
+    gunicorn -c gunicorn.conf.py
+"""
+
+import queue_helper
+from flask_server import app
+
+# Create the queue database schema (first run) before serving requests
+queue_helper.init_db()